@@ -0,0 +1,213 @@
+import math
+import numpy as np
+
+ENCODINGS = ['pairwise', 'sequential', 'commander', 'product']
+GROUP_SIZE = 3 # commander groups
+PRODUCT_BASE = 4 # below this size the product encoding falls back to pairwise
+
+def amo_encoding(lits, encoding, new_var):
+    # at-most-one constraint over lits with auxiliary variables from new_var().
+    # Returns (clauses, proof): the clauses of the encoding, and DRAT lines deriving them from the
+    # pairwise clauses -a -b (which must hold in the proof state, directly or by unit propagation).
+    # The auxiliary variables get full definitions in the proof, so each new clause is RAT on a fresh
+    # variable or RUP; definitions and intermediate lemmas are deleted at the end.
+    clauses, proof, scratch = [], [], []
+    _amo(list(lits), encoding, new_var, clauses, proof, scratch, False)
+    for line in scratch:
+        proof.append(['d'] + line)
+    return clauses, proof
+
+def _amo(lits, encoding, new_var, clauses, proof, scratch, derived):
+    # derived means the pairwise clauses over lits were added by the caller's proof lines,
+    # so those that are not kept in the encoding have to be deleted
+    kept = set()
+    if encoding == 'sequential' and len(lits) > 2:
+        _sequential(lits, new_var, clauses, proof, scratch)
+    elif encoding == 'commander' and len(lits) > GROUP_SIZE:
+        groups = [lits[k:k+GROUP_SIZE] for k in range(0, len(lits), GROUP_SIZE)]
+        commanders = [_group(group, new_var, clauses, proof, scratch) for group in groups]
+        for group in groups:
+            kept.update(_pairwise(group, clauses))
+        _derive_pairwise(groups, commanders, proof, scratch)
+        _amo(commanders, encoding, new_var, clauses, proof, scratch, True)
+    elif encoding == 'product' and len(lits) > PRODUCT_BASE:
+        width = math.ceil(math.sqrt(len(lits)))
+        rows = [lits[k:k+width] for k in range(0, len(lits), width)]
+        cols = [lits[k::width] for k in range(width)]
+        row_vars = [_group(row, new_var, clauses, proof, scratch) for row in rows]
+        col_vars = [_group(col, new_var, clauses, proof, scratch) for col in cols]
+        _derive_pairwise(rows, row_vars, proof, scratch)
+        _derive_pairwise(cols, col_vars, proof, scratch)
+        _amo(row_vars, encoding, new_var, clauses, proof, scratch, True)
+        _amo(col_vars, encoding, new_var, clauses, proof, scratch, True)
+    else:
+        kept.update(_pairwise(lits, clauses))
+    if not derived:
+        # the kept pairs may have been deleted from the proof state (when the new variables
+        # of the plus encoding solve them), they are RUP anyway
+        proof.extend([-a, -b] for a, b in kept)
+    if derived:
+        for a in range(len(lits)):
+            for b in range(a+1, len(lits)):
+                if (lits[a], lits[b]) not in kept:
+                    scratch.append([-lits[a], -lits[b]])
+
+def _pairwise(lits, clauses):
+    kept = set()
+    for a in range(len(lits)):
+        for b in range(a+1, len(lits)):
+            clauses.append([-lits[a], -lits[b]])
+            kept.add((lits[a], lits[b]))
+    return kept
+
+def _sequential(lits, new_var, clauses, proof, scratch):
+    # s_i means "one of lits[0..i] is true"
+    s = [new_var() for _ in range(len(lits)-1)]
+    for i in range(len(s)):
+        line = [s[i], -lits[i]]
+        proof.append(line)
+        clauses.append(line)
+        if i > 0:
+            line = [s[i], -s[i-1]]
+            proof.append(line)
+            clauses.append(line)
+        definition = [-s[i], lits[i]] + ([s[i-1]] if i > 0 else [])
+        proof.append(definition)
+        scratch.append(definition)
+    # -s_i -x_j for i < j, by induction on i: s_i and not s_{i-1} give x_i, in conflict with x_j
+    for j in range(1, len(lits)):
+        for i in range(j):
+            lemma = [-s[i], -lits[j]]
+            proof.append(lemma)
+            if i == j-1:
+                clauses.append(lemma)
+            else:
+                scratch.append(lemma)
+
+def _group(group, new_var, clauses, proof, scratch):
+    # a variable implied by every literal of the group, defined as their disjunction
+    var = new_var()
+    for lit in group:
+        line = [var, -lit]
+        proof.append(line)
+        clauses.append(line)
+    definition = [-var] + group
+    proof.append(definition)
+    scratch.append(definition)
+    return var
+
+def _derive_pairwise(groups, group_vars, proof, scratch):
+    # two group variables exclude each other: each literal of one group excludes the other
+    # group variable (its group is all in conflict with the literal), hence its definition fails
+    for a in range(len(groups)):
+        for b in range(a+1, len(groups)):
+            for lit in groups[a]:
+                lemma = [-lit, -group_vars[b]]
+                proof.append(lemma)
+                scratch.append(lemma)
+            proof.append([-group_vars[a], -group_vars[b]])
+
+encoding_costs = {}
+def encoding_cost(size, encoding):
+    # (auxiliary variables, clauses) of an encoding over size literals
+    if (size, encoding) not in encoding_costs:
+        counter = [size]
+        def new_var():
+            counter[0] += 1
+            return counter[0]
+        clauses, proof = amo_encoding(list(range(1, size+1)), encoding, new_var)
+        encoding_costs[(size, encoding)] = (counter[0] - size, len(clauses))
+    return encoding_costs[(size, encoding)]
+
+def conflict_cliques(positions, color, normalize=None, stride=1):
+    # maximal sets of positions pairwise within distance color: in the rotated coordinates
+    # u = i+j, v = i-j the distance is the max norm, so they are the lattice points of the boxes
+    # [u0, u0+color] x [v0, v0+color], here anchored every stride units.
+    # With normalize (torus), points are reduced modulo the period.
+    position_set = set(positions)
+    us = [i+j for i, j in positions]
+    vs = [i-j for i, j in positions]
+    cliques = []
+    seen = set()
+    for u0 in range(min(us)-color, max(us)+1, stride):
+        for v0 in range(min(vs)-color, max(vs)+1, stride):
+            clique = []
+            for u in range(u0, u0+color+1):
+                for v in range(v0 + (u-v0) % 2, v0+color+1, 2):
+                    pos = ((u+v)//2, (u-v)//2)
+                    if normalize is not None:
+                        pos = normalize(pos)
+                    if pos in position_set and pos not in clique:
+                        clique.append(pos)
+            key = tuple(sorted(clique))
+            if len(clique) >= 3 and key not in seen:
+                seen.add(key)
+                cliques.append(clique)
+    return cliques
+
+def amo_conflicts(positions, color, lit_of, needed, encoding, new_var, normalize=None, stride=1, stats=None):
+    # Replaces the binary conflicts of one color by at-most-one encodings over cliques.
+    # needed is a symmetric boolean matrix over positions of the pairs that must be excluded;
+    # a clique is used when it covers more of them than its encoding has clauses.
+    # Returns (clauses, proof, remaining, replaced): the encoding clauses, their derivation,
+    # the matrix of pairs still to be emitted as binary clauses, and the pairs (lit, lit)
+    # whose binary clauses are now implied (the caller deletes them in the proof).
+    index = {pos: k for k, pos in enumerate(positions)}
+    remaining = needed.copy()
+    chosen = []
+    for clique in sorted(conflict_cliques(positions, color, normalize, stride), key=len, reverse=True):
+        idx = np.array([index[pos] for pos in clique])
+        gain = remaining[np.ix_(idx, idx)].sum() // 2
+        if gain > encoding_cost(len(clique), encoding)[1]:
+            chosen.append(clique)
+            remaining[np.ix_(idx, idx)] = False
+
+    clauses, proof = [], []
+    kept = set()
+    n_vars = 0
+    def counted_new_var():
+        nonlocal n_vars
+        n_vars += 1
+        return new_var()
+    for clique in chosen:
+        lits = [lit_of(pos) for pos in clique]
+        amo_clauses, amo_proof = amo_encoding(lits, encoding, counted_new_var)
+        originals = set(lits)
+        for clause in amo_clauses:
+            if len(clause) == 2 and -clause[0] in originals and -clause[1] in originals:
+                pair = (min(-clause[0], -clause[1]), max(-clause[0], -clause[1]))
+                if pair in kept:
+                    continue
+                kept.add(pair)
+            clauses.append(clause)
+        proof.extend(amo_proof)
+
+    covered = np.argwhere(np.triu(needed & ~remaining)).tolist()
+    replaced = []
+    for a, b in covered:
+        pair = (min(lit_of(positions[a]), lit_of(positions[b])), max(lit_of(positions[a]), lit_of(positions[b])))
+        if pair not in kept:
+            replaced.append(pair)
+    if stats is not None:
+        stats['cliques'] = stats.get('cliques', 0) + len(chosen)
+        stats['vars'] = stats.get('vars', 0) + n_vars
+        stats['clauses'] = stats.get('clauses', 0) + len(clauses)
+        stats['replaced'] = stats.get('replaced', 0) + len(covered)
+    return clauses, proof, remaining, replaced
+
+def amo_clauses(positions, pairs, color, lit_of, encoding, V, normalize=None, stride=1, stats=None):
+    # amo_conflicts for the binary conflicts pairs (of positions) of one color, with its auxiliary
+    # variables allocated in V as ('amo', color, var). Returns (clauses, proof, pairs): the encoding
+    # clauses, their derivation followed by the deletion of the binary clauses they make redundant,
+    # and the pairs still to be emitted as binary clauses.
+    index = {pos: k for k, pos in enumerate(positions)}
+    needed = np.zeros((len(positions), len(positions)), dtype=bool)
+    for pos, pos2 in pairs:
+        needed[index[pos], index[pos2]] = needed[index[pos2], index[pos]] = True
+    def new_var():
+        var = len(V) + 1
+        V[('amo', color, var)] = var
+        return var
+    clauses, proof, needed, replaced = amo_conflicts(positions, color, lit_of, needed, encoding, new_var, normalize, stride, stats)
+    proof.extend(['d', -a, -b] for a, b in replaced)
+    return clauses, proof, [(pos, pos2) for pos, pos2 in pairs if needed[index[pos], index[pos2]]]
@@ -0,0 +1,168 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+import multiprocessing
+from pysat.solvers import Solver
+from run_shards import read_icnf
+
+# name -> (script, extra arguments); -r, -k, -o (and -i for placements) are added by the harness
+VARIANTS = {
+    'direct': ('direct.py', []),
+    'direct-A': ('direct.py', ['-A', '1']),
+    'plus': ('from_placement.py', []),
+    'plus-A': ('from_placement.py', ['-A', '1']),
+    'plus-S5': ('from_placement.py', ['-S', '5']),
+    'plus-A-S5': ('from_placement.py', ['-A', '1', '-S', '5']),
+    'plus-A-S5-P5T5R5': ('from_placement.py', ['-A', '1', '-S', '5', '-P', '5', '-T', '5', '-R', '5']),
+}
+SRC = os.path.dirname(os.path.abspath(__file__))
+# pysat solvers that can be interrupted; the others (CaDiCaL) are killed at the time limit
+INTERRUPTIBLE = ('minisat', 'glucose', 'gluecard', 'minicard', 'maple', 'mergesat')
+KILL_GRACE = 5 # seconds given to an interruptible solver (which also reads its formula) before it is killed
+
+def generate(name, script, extra, radius, colors, placement, workdir):
+    # runs the encoder in workdir, returns (formula file, encode seconds)
+    for ext in ['.cnf', '.icnf']:
+        if os.path.exists(os.path.join(workdir, 'formulas', name + ext)):
+            os.remove(os.path.join(workdir, 'formulas', name + ext))
+    cmd = [sys.executable, os.path.join(SRC, script), '-r', str(radius), '-k', str(colors)]
+    if script == 'direct.py':
+        cmd += ['-o', os.path.join('formulas', name)]
+    else:
+        assert placement is not None, f'variant {name} needs a placement (-i)'
+        cmd += ['-i', os.path.abspath(placement), '-o', name]
+    start = time.time()
+    subprocess.run(cmd + extra, cwd=workdir, check=True, stdout=subprocess.DEVNULL)
+    seconds = time.time() - start
+    for ext in ['.icnf', '.cnf']:
+        if os.path.exists(os.path.join(workdir, 'formulas', name + ext)):
+            return os.path.join(workdir, 'formulas', name + ext), seconds
+    raise FileNotFoundError(f'{script} did not write formulas/{name}.cnf')
+
+def solve_job(job, results):
+    # runs in its own process, so that it can be killed at the time limit
+    # (the CaDiCaL bindings of pysat do not support interrupts). The solvers that do are interrupted
+    # at the time limit instead, so that their conflicts up to then are known; for the others,
+    # the conflicts are reported after each cube.
+    idx, formula, seed, solver_name, time_limit = job
+    clauses, cubes = read_icnf(formula)
+    if seed != 0: # pysat exposes no seeds, a permutation of the clauses plays that role
+        random.Random(seed).shuffle(clauses)
+    start = time.time()
+    solver = Solver(name=solver_name, bootstrap_with=clauses)
+    timer = None
+    if time_limit is not None and solver_name.startswith(INTERRUPTIBLE):
+        timer = threading.Timer(time_limit, solver.interrupt)
+        timer.start()
+    result = False
+    for cube in cubes if len(cubes) > 0 else [[]]:
+        if timer is not None:
+            result = solver.solve_limited(assumptions=cube, expect_interrupt=True)
+        else:
+            result = solver.solve(assumptions=cube)
+        if result is not False:
+            break
+        results.put((idx, 'PROGRESS', time.time() - start, solver.accum_stats().get('conflicts', 0)))
+    if timer is not None:
+        timer.cancel()
+    conflicts = solver.accum_stats().get('conflicts', 0)
+    solver.delete()
+    status = 'TIMEOUT' if result is None else 'SAT' if result else 'UNSAT'
+    results.put((idx, status, time.time() - start if result is not None else time_limit, conflicts))
+
+def formula_size(formula):
+    clauses, cubes = read_icnf(formula)
+    n_vars = max((abs(lit) for clause in clauses + cubes for lit in clause), default=0)
+    return n_vars, len(clauses), len(cubes), os.path.getsize(formula)
+
+def run_jobs(jobs, n_workers, time_limit):
+    # at most n_workers solver processes at once; returns idx -> (result, seconds, conflicts), where
+    # the conflicts of a job killed at the time limit are the last ones it reported (0 if none)
+    results = multiprocessing.Queue()
+    pending = list(jobs)
+    running = {}
+    answers = {}
+    progress = {}
+    while pending or running:
+        while pending and len(running) < n_workers:
+            job = pending.pop(0) + (time_limit,)
+            process = multiprocessing.Process(target=solve_job, args=(job, results))
+            process.start()
+            limit = None if time_limit is None else time_limit + (KILL_GRACE if job[3].startswith(INTERRUPTIBLE) else 0)
+            running[job[0]] = (process, time.time(), limit)
+        try:
+            idx, result, seconds, conflicts = results.get(timeout=0.1)
+            if result == 'PROGRESS':
+                progress[idx] = conflicts
+            elif idx in running: # not already killed at the time limit
+                answers[idx] = (result, seconds, conflicts)
+                running.pop(idx)[0].join()
+        except queue.Empty:
+            pass
+        for idx, (process, start, limit) in list(running.items()):
+            if limit is not None and time.time() - start > limit:
+                process.terminate()
+                process.join()
+                answers[idx] = ('TIMEOUT', time_limit, progress.get(idx, 0))
+                running.pop(idx)
+            elif not process.is_alive() and process.exitcode != 0:
+                answers[idx] = ('ERROR', time.time() - start, progress.get(idx, 0))
+                running.pop(idx)
+    return answers
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generates encoding variants and compares their solving times.")
+    parser.add_argument('-r', '--radius', help='radius', type=int, required=True)
+    parser.add_argument('-k', '--colors', help='number of colors', type=int, required=True)
+    parser.add_argument('-i', '--input', help='placement file for the plus variants', default=None)
+    parser.add_argument('--variants', help=f'comma-separated variants among {", ".join(VARIANTS)}', default='direct,plus,plus-A-S5')
+    parser.add_argument('--variant', help="additional variant, as 'name=script extra arguments' (e.g. 'plus-S3=from_placement.py -S 3')", action='append', default=[])
+    parser.add_argument('-s', '--solvers', help='comma-separated pysat solver names', default='cadical153')
+    parser.add_argument('--seeds', type=int, help='number of runs per variant and solver (seed 0 keeps the clause order, others shuffle it)', default=1)
+    parser.add_argument('-t', '--timelimit', type=float, help='time limit per solve, in seconds', default=None)
+    parser.add_argument('-j', '--jobs', type=int, help='number of parallel solver processes', default=1)
+    parser.add_argument('-w', '--workdir', help='directory where the formulas are generated', default='bench')
+    parser.add_argument('-o', '--output', help='results table (.csv or .json)', default='bench/results.csv')
+    args = parser.parse_args()
+
+    variants = {name: VARIANTS[name] for name in args.variants.split(',') if name}
+    for spec in args.variant:
+        name, command = spec.split('=', 1)
+        script, *extra = command.split()
+        variants[name] = (script, extra)
+    os.makedirs(os.path.join(args.workdir, 'formulas'), exist_ok=True)
+    os.makedirs(os.path.join(args.workdir, 'proofs'), exist_ok=True)
+
+    rows = []
+    jobs = []
+    for name, (script, extra) in variants.items():
+        formula, encode_seconds = generate(f'{name}-{args.radius}-{args.colors}', script, extra, args.radius, args.colors, args.input, args.workdir)
+        n_vars, n_clauses, n_cubes, n_bytes = formula_size(formula)
+        print(f'{name}: encoded in {encode_seconds:.2f}s, {n_vars} vars, {n_clauses} clauses, {n_cubes} cubes')
+        for solver_name in args.solvers.split(','):
+            for seed in range(args.seeds):
+                jobs.append((len(rows), formula, seed, solver_name))
+                rows.append({'variant': name, 'solver': solver_name, 'seed': seed, 'encode_seconds': round(encode_seconds, 3),
+                             'vars': n_vars, 'clauses': n_clauses, 'cubes': n_cubes, 'bytes': n_bytes})
+
+    for idx, (result, seconds, conflicts) in sorted(run_jobs(jobs, args.jobs, args.timelimit).items()):
+        rows[idx].update({'result': result, 'solve_seconds': round(seconds, 3), 'conflicts': conflicts})
+        row = rows[idx]
+        print(f"{row['variant']} ({row['solver']}, seed {row['seed']}): {result} in {seconds:.2f}s, {conflicts} conflicts")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        if args.output.endswith('.json'):
+            json.dump(rows, f, indent=1)
+        else:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+    print(f'results written to {args.output}')
@@ -0,0 +1,64 @@
+import argparse
+import sys
+import time
+import numpy as np
+import structured_api
+import validator
+
+parser = argparse.ArgumentParser(description="Decodes a solver model into a coloring and checks it is a packing coloring.")
+parser.add_argument('-i', '--input', help='solver output with the model in v lines', required=True)
+parser.add_argument('-r', '--radius', help='radius (or side for squares)', type=int, required=True)
+parser.add_argument('-k', '--colors', help='number of colors of the encoding', type=int, required=True)
+parser.add_argument('-g', '--geometry', help='geometry (square, diamond or torus)', type=str, default="diamond")
+parser.add_argument('--height', help='height of the torus (defaults to the radius/side)', type=int, default=None)
+parser.add_argument('-p', '--print', help='prints the coloring', action='store_true')
+parser.add_argument('--png', help='writes the coloring to this png file', default=None)
+parser.add_argument('-v', '--verbose', action='count', default=0)
+args = parser.parse_args()
+
+radius = args.radius
+colors = args.colors
+geometry = args.geometry
+height = args.height if args.height is not None else radius
+periodic = geometry == "torus"
+verbose = args.verbose
+
+if geometry == "diamond":
+    positions = structured_api.Structure(radius, colors).positions
+elif periodic:
+    positions = structured_api.Structure(radius, colors, period=(radius, height)).positions
+else:
+    positions = [(i, j) for i in range(radius) for j in range(radius)]
+
+status, model = validator.read_model(args.input)
+if status is not None:
+    print(f's {status}')
+if len(model) == 0:
+    print('no model found')
+    sys.exit(1)
+
+start = time.time()
+grid, origin, domain = validator.decode_model(model, positions, colors)
+missing = validator.uncolored(grid, domain, origin)
+bad = validator.conflicts(grid, periodic=periodic, origin=origin)
+if verbose > 0:
+    print(f'decoded and checked in {time.time() - start:.3f}s')
+
+if args.print:
+    for y in range(grid.shape[1]-1, -1, -1):
+        print(' '.join(f'{grid[x][y]:2d}' if domain[x][y] else '  ' for x in range(grid.shape[0])))
+
+if args.png is not None:
+    import plotter
+    plotter.export_pngs([np.where(domain, grid, -1).tolist()], [args.png])
+
+for pos in missing[:10]:
+    print(f'uncolored position {pos}')
+for p, q, c in bad[:10]:
+    d = structured_api.torus_dist(p, q, (radius, height)) if periodic else structured_api.dist(p, q)
+    print(f'positions {p} and {q} both have color {c} at distance {d}')
+if len(missing) == 0 and len(bad) == 0:
+    print(f'valid packing coloring with {len(np.unique(grid[domain]))} colors')
+else:
+    print(f'invalid coloring: {len(missing)} uncolored positions, {len(bad)} conflicts')
+    sys.exit(1)
@@ -0,0 +1,48 @@
+import argparse
+import json
+import os
+import sys
+import time
+import dimacs
+import selfcheck
+from checksums import stage
+
+def read_lines(filename):
+    # DRAT lines in the format of selfcheck: (file, line number, lits), with 'd' first for deletions
+    lines = []
+    for lits, lengths, kinds in dimacs.read_line_chunks(filename):
+        for clause, kind in zip(dimacs.split_clauses(lits, lengths), kinds):
+            lines.append((os.path.basename(filename), len(lines)+1, (['d'] if kind == dimacs.DELETION else []) + clause.tolist()))
+    return lines
+
+def read_formula(filename):
+    lits, lengths = dimacs.read_clauses(filename)
+    return [clause.tolist() for clause in dimacs.split_clauses(lits, lengths)]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Checks the per-color proof segments listed in a manifest, in parallel.")
+    parser.add_argument('-m', '--manifest', help='manifest written by from_placement.py --segments', required=True)
+    parser.add_argument('-j', '--jobs', type=int, help='number of parallel workers (defaults to the number of cores)', default=None)
+    parser.add_argument('-s', '--solver', help='pysat solver name used for unit propagation', default='minisat22')
+    args = parser.parse_args()
+
+    with open(args.manifest, 'r') as f:
+        manifest = json.load(f)
+    directory = os.path.dirname(args.manifest)
+
+    jobs = []
+    for segment in manifest['segments']:
+        formula_file, proof_file = stage(directory, (segment['formula'], segment['formula_sha256']), (segment['proof'], segment['proof_sha256']))
+        formula, lines = read_formula(formula_file), read_lines(proof_file)
+        assert len(formula) == segment['premises'] and len(lines) == segment['lines'], f'segment of color {segment["color"]} does not match the manifest'
+        jobs.append((segment['color'], formula, lines, args.solver))
+    print(f'{len(jobs)} segments staged, {sum(len(job[2]) for job in jobs)} lines')
+
+    start = time.time()
+    failures = selfcheck.check_all(jobs, args.jobs)
+    for color, (name, number, lits) in failures:
+        print(f'segment of color {color}: line {number} of {name} is neither RUP nor RAT within its segment: {lits}')
+    if manifest['unchecked']:
+        print(f'not covered by the segments: {", ".join(manifest["unchecked"])}')
+    print(f'{"FAILED" if failures else "VERIFIED"} (wall-clock {time.time() - start:.2f}s); the segments compose as: {manifest["composition"]}')
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,18 @@
+import hashlib
+import os
+
+def sha256_of(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def stage(directory, *entries):
+    # the paths of the files (name, sha256) listed in a manifest in directory; each must match its checksum
+    paths = []
+    for name, checksum in entries:
+        path = os.path.join(directory, name)
+        assert sha256_of(path) == checksum, f'checksum mismatch for {path}'
+        paths.append(path)
+    return paths
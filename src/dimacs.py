@@ -0,0 +1,106 @@
+import mmap
+import os
+import re
+import numpy as np
+
+# header and comment lines are dropped before the numbers are parsed
+SKIP_LINES = re.compile(rb'^[cp][^\n]*', re.M)
+# cubes of .icnf files ('a' lines) and deletions of DRAT proofs ('d' lines) are parsed
+# with a marker number in place of the letter
+CUBE_LINES = re.compile(rb'^a', re.M)
+DELETION_LINES = re.compile(rb'^d', re.M)
+CUBE_MARK = 1 << 62
+DELETION_MARK = CUBE_MARK + 1
+# kinds of lines
+CLAUSE, CUBE, DELETION = 0, 1, 2
+
+def read_clause_chunks(filename, chunk_size=1 << 24):
+    # yields pairs (lits, lengths): the literals of consecutive clauses
+    # (without the terminating zeros) and the length of each clause.
+    # The file is memory-mapped and parsed in blocks of about chunk_size bytes,
+    # so only one block of clauses is held in memory at a time.
+    # Cube and deletion lines are skipped, see read_line_chunks.
+    for lits, lengths, kinds in read_line_chunks(filename, chunk_size):
+        if kinds.any():
+            lits = lits[np.repeat(kinds == CLAUSE, lengths)]
+            lengths = lengths[kinds == CLAUSE]
+        yield lits, lengths
+
+def read_line_chunks(filename, chunk_size=1 << 24):
+    # as read_clause_chunks, for .cnf, .icnf and (text) DRAT files: yields triples
+    # (lits, lengths, kinds) where kinds tells for each line whether it is a
+    # CLAUSE (or lemma), a CUBE or a DELETION.
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            carry = np.zeros(0, dtype=np.int64)
+            start = 0
+            while start < size:
+                end = mm.find(b'\n', min(start + chunk_size, size) - 1)
+                end = size if end == -1 else end + 1
+                block = SKIP_LINES.sub(b'', mm[start:end])
+                block = CUBE_LINES.sub(b'%d' % CUBE_MARK, block)
+                block = DELETION_LINES.sub(b'%d' % DELETION_MARK, block).strip()
+                start = end
+                if not block:
+                    continue
+                numbers = np.concatenate((carry, np.fromstring(block, dtype=np.int64, sep=' ')))
+                zeros = np.flatnonzero(numbers == 0)
+                if len(zeros) == 0:
+                    carry = numbers
+                    continue
+                # a clause may continue on the next block
+                carry = numbers[zeros[-1]+1:]
+                numbers = numbers[:zeros[-1]+1]
+                lengths = np.diff(np.concatenate(([-1], zeros))) - 1
+                starts = np.concatenate(([0], zeros[:-1]+1))
+                kinds = np.full(len(lengths), CLAUSE, dtype=np.int8)
+                first = numbers[np.minimum(starts, len(numbers)-1)]
+                kinds[(first == CUBE_MARK) & (lengths > 0)] = CUBE
+                kinds[(first == DELETION_MARK) & (lengths > 0)] = DELETION
+                marked = kinds != CLAUSE
+                lengths[marked] -= 1
+                keep = numbers != 0
+                keep[starts[marked]] = False
+                yield numbers[keep], lengths, kinds
+
+def read_clauses(filename, chunk_size=1 << 24):
+    # the whole formula as a single (lits, lengths) pair
+    all_lits, all_lengths = [], []
+    for lits, lengths in read_clause_chunks(filename, chunk_size):
+        all_lits.append(lits)
+        all_lengths.append(lengths)
+    if not all_lits:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(all_lits), np.concatenate(all_lengths)
+
+def clauses_to_arrays(clauses):
+    lengths = np.array([len(clause) for clause in clauses], dtype=np.int64)
+    lits = np.fromiter((lit for clause in clauses for lit in clause), dtype=np.int64, count=int(lengths.sum()))
+    return lits, lengths
+
+def split_clauses(lits, lengths):
+    # the clauses of a (lits, lengths) pair, as one array each
+    return np.split(lits, np.cumsum(lengths)[:-1]) if len(lengths) else []
+
+def clause_starts(lengths):
+    return np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+
+def splitmix64(x):
+    # the splitmix64 finalizer, on uint64 arrays (arithmetic wraps around)
+    x = x.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def clause_hashes(lits, lengths, kinds=None):
+    # a 64-bit hash per clause that does not depend on the order of its literals: the sum of the hashes
+    # of the literals, mixed again (with the kind, so that a cube and a clause differ)
+    ends = np.cumsum(lengths)
+    sums = np.concatenate((np.zeros(1, dtype=np.uint64), np.cumsum(splitmix64(lits.view(np.uint64)), dtype=np.uint64)))
+    hashes = sums[ends] - sums[ends - lengths]
+    if kinds is not None:
+        hashes = hashes + kinds.astype(np.uint64)
+    return splitmix64(hashes)
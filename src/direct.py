@@ -1,11 +1,13 @@
 import argparse
-from structured_api import Structure
+import amo
+from structured_api import Structure, parse_centers
 
 parser = argparse.ArgumentParser(description="Generator of instances with the direct encoding.")
 parser.add_argument('-o', '--output', help='name of the generated .cnf file', default='enc.cnf')
 parser.add_argument('-r', '--radius', help='radius (or side for squares)', type=int, required=True)
 parser.add_argument('-k', '--colors', help='number of colors to be used', type=int, required=True)
-parser.add_argument('-g', '--geometry', help='geometry (square or diamond)',type=str, default="diamond")
+parser.add_argument('-g', '--geometry', help='geometry (square, diamond or torus)',type=str, default="diamond")
+parser.add_argument('--height', help='height of the torus (defaults to the radius/side)', type=int, default=None)
 parser.add_argument('-v', '--verbose', action='count', default=0)
 parser.add_argument('-A', '--alod', type=int, help="adds ALOD clauses", default=0)
 parser.add_argument('-c', '--centerforce', type=int, help="value to which the center is forced (-1 for no forcing, 0 for min(r, c))", default=0)
@@ -14,6 +16,10 @@ parser.add_argument('--unit_ints', help="allows introducing unit clauses as ints
 parser.add_argument('--chessboard', help="toggles the chessboard of ones; i.e., 1s forced at odd parities", action='store_true')
 parser.add_argument('--singlecolor', help="encode only constraints for a single color", type=int, default=None)
 parser.add_argument('-S', '--symmetry', type=int, help="symmetry breaking layers", default=0)
+parser.add_argument('--centers', help="encodes once for several center colors ('all' or a comma-separated list), see --centermode; -c is then ignored", default=None)
+parser.add_argument('--centermode', help="icnf: one <output>-centers.icnf with a cube per center color; files: one <output>-<c>.cnf per center color", default='icnf')
+parser.add_argument('--amo', help="encoding of the conflicts of a color: pairwise, sequential, commander or product (at-most-one constraints over cliques, derived in <output>-amo.drat)", default='pairwise')
+parser.add_argument('--amostride', type=int, help="distance between the anchors of the candidate cliques for --amo", default=1)
 args = parser.parse_args()
 
 filename = args.output
@@ -29,23 +35,30 @@ unit_ints = args.unit_ints
 chessboard = args.chessboard
 single_color = args.singlecolor
 symmetry = args.symmetry
+height = args.height if args.height is not None else radius
+amo_encoding = args.amo
+centers = parse_centers(args.centers, colors, args.centermode)
+assert amo_encoding in amo.ENCODINGS
 
 if verbose > 0:
     print("Parameters:")
     print(f" output = {filename}")
     print(f" radius/size = {radius}")
-    if geometry != "diamond":
+    if geometry not in ["diamond", "torus"]:
         geometry = "square"
     print(f" geometry  = {geometry}")
+    if geometry == "torus":
+        print(f" period = {radius} x {height}")
     print(f" maximum color  = {colors}")
     print(f" ALOD clauses  = {alod_clauses}")
     print(f" forcing center to  = {min(radius, colors) if center_force == 0 else center_force}")
     print(f" units = {units}")
     print(f" chessboard = {chessboard}")
     print(f" symmetry = {symmetry}")
+    print(f" amo = {amo_encoding}")
 
 
-structurer = Structure(radius, colors, symmetry)
+structurer = Structure(radius, colors, symmetry, period=(radius, height) if geometry == "torus" else None)
 V = {}
 IV = {}
 
@@ -57,6 +70,10 @@ if geometry == "diamond":
         for j in range(-radius, radius+1):
             if abs(i) + abs(j) > radius: continue
             positions.append((i, j))
+elif geometry == "torus":
+    for i in range(radius):
+        for j in range(height):
+            positions.append((i, j))
 else:
     for i in range(radius):
         for j in range(radius):
@@ -107,19 +124,59 @@ if single_color is None:
 else:
     colors_to_constrain = [single_color]
 
+amo_proof = []
+amo_stats = {}
 for clr in colors_to_constrain:
         vdirs = list(filter(lambda x: x[0] > 0 or (x[0] == 0 and x[1] > 0), vdirs_k(clr)))
-        for pos in positions:
-            i, j = pos
-            for vdir in vdirs:
-                    di, dj = vdir
-                    new_i, new_j = i+di, j +dj
-                    if (new_i, new_j) in positions:
-                        clauses.append([-V[(i, j, clr)], -V[(new_i, new_j, clr)]]) 
+        conflicts = []
+        if geometry == "torus":
+            # distances wrap around; a cell may even be in conflict with itself
+            pairs = set()
+            for pos in positions:
+                i, j = pos
+                for vdir in vdirs:
+                        di, dj = vdir
+                        new_i, new_j = (i+di) % radius, (j+dj) % height
+                        a, b = V[(i, j, clr)], V[(new_i, new_j, clr)]
+                        if (min(a, b), max(a, b)) not in pairs:
+                            pairs.add((min(a, b), max(a, b)))
+                            if a == b:
+                                clauses.append([-a])
+                            else:
+                                conflicts.append((pos, (new_i, new_j)))
+        else:
+            for pos in positions:
+                i, j = pos
+                for vdir in vdirs:
+                        di, dj = vdir
+                        new_i, new_j = i+di, j +dj
+                        if (new_i, new_j) in positions:
+                            conflicts.append((pos, (new_i, new_j)))
+
+        amo_clauses = []
+        if amo_encoding != 'pairwise' and len(conflicts) > 0:
+            # conflicts within a clique become a single at-most-one constraint
+            n_vars = len(V)
+            normalize = (lambda p: (p[0] % radius, p[1] % height)) if geometry == "torus" else None
+            amo_clauses, proof, conflicts = amo.amo_clauses(positions, conflicts, clr, lambda p: V[(p[0], p[1], clr)],
+                                                            amo_encoding, V, normalize, args.amostride, amo_stats)
+            for var in range(n_vars+1, len(V)+1):
+                IV[var] = ('amo', clr, var)
+            amo_proof.extend(proof)
+        for pos, pos2 in conflicts:
+            clauses.append([-V[(pos[0], pos[1], clr)], -V[(pos2[0], pos2[1], clr)]])
+        clauses.extend(amo_clauses)
 
 # force center
-if center_force != -1:
-    if geometry == 'diamond':
+center_pos = (radius//2, radius//2) if geometry not in ['diamond', 'torus'] else (0, 0)
+center_line = len(clauses) # where the center unit goes, for --centers
+if centers is not None:
+    pass
+elif center_force != -1:
+    if geometry == 'torus':
+        # breaks the translation symmetry, (0, 0) gets the highest usable color by default
+        clauses.append([V[(0, 0, min(colors, min(radius, height)-1) if center_force == 0 else center_force)]])
+    elif geometry == 'diamond':
         if center_force == 0:
             clauses.append([V[(0, 0, min(radius, colors))]])
         else:
@@ -159,4 +216,31 @@ def write_to_file(clauses, filename):
             print(f"# vars = {len(V)}, # clauses = {len(clauses)}")
 
 
-write_to_file(clauses, filename + '.cnf')
+if centers is None:
+    write_to_file(clauses, filename + '.cnf')
+else:
+    prefix = ''.join(clause_to_text(clause) + '\n' for clause in clauses[:center_line])
+    suffix = ''.join(clause_to_text(clause) + '\n' for clause in clauses[center_line:])
+    if args.centermode == 'files':
+        for c in centers:
+            with open(f'{filename}-{c}.cnf', 'w') as file:
+                file.write(f"p cnf {len(V)} {len(clauses)+1}\n")
+                file.write(prefix)
+                file.write(clause_to_text([V[center_pos + (c,)]]) + '\n')
+                file.write(suffix)
+    else:
+        with open(filename + '-centers.icnf', 'w') as file:
+            file.write('p inccnf\n')
+            file.write(prefix)
+            file.write(suffix)
+            for c in centers:
+                file.write('a ' + clause_to_text([V[center_pos + (c,)]]) + '\n')
+    if verbose > 0:
+        print(f"# vars = {len(V)}, # clauses = {len(clauses)} (+ center unit), # centers = {len(centers)}")
+if amo_encoding != 'pairwise':
+    # derivation of the at-most-one clauses from the pairwise encoding
+    with open(filename + '-amo.drat', 'w') as file:
+        for line in amo_proof:
+            file.write(clause_to_text(line) + '\n')
+    if verbose > 0:
+        print(f"amo ({amo_encoding}): {amo_stats.get('cliques', 0)} cliques, {amo_stats.get('vars', 0)} new variables, {amo_stats.get('clauses', 0)} clauses replacing {amo_stats.get('replaced', 0)} binary clauses")
@@ -1,14 +1,22 @@
 import json
+import hashlib
 from pysat.formula import CNF
 import argparse
 import structured_api
+import preprocess
+import amo
+import lrat
+import selfcheck
+import sys
 import os
+import time
+from checksums import sha256_of
 
 parser = argparse.ArgumentParser(description="Placement to encoding.")
 parser.add_argument('-r', '--radius', help='radius', type=int, required=True)
 parser.add_argument('-k', '--colors', help='number of colors to be used', type=int, required=True)
-parser.add_argument('-i', '--input', help='name of the input placement file', required=True)
-parser.add_argument('-o', '--output', help='basename of the output files', required=True)
+parser.add_argument('-i', '--input', help='name of the input placement file (several with --dry-run)', nargs='+', required=True)
+parser.add_argument('-o', '--output', help='basename of the output files', default=None)
 parser.add_argument('-v', '--verbose', action='count', default=0)
 parser.add_argument('-m', '--minimization', help="adds minimization clauses", action='store_true')
 parser.add_argument('-c', '--centerforce', type=int, help="value to which the center is forced (-1 for no forcing, 0 for min(r, c))", default=0)
@@ -16,19 +24,39 @@ parser.add_argument('-P', '--positive', type=int, help='max number of positive l
 parser.add_argument('-T', '--splitcolors', type=int, help='number of colors to split')
 parser.add_argument('-R', '--split', type=int, help='number of new variables to use for the split')
 parser.add_argument('-b', '--backcubes', help='puts cubes in reverse order', action='store_true')
+parser.add_argument('--shards', type=int, help='splits the cubes into this many self-contained .icnf files, plus a manifest', default=0)
+parser.add_argument('--shardmode', help='how cubes are assigned to shards: contiguous or roundrobin', default='contiguous')
+parser.add_argument('--sharedbase', help='shards only hold cubes and refer to the shared .cnf file', action='store_true')
 parser.add_argument('-S', '--symmetry', type=int,  help='enables symmetry breaking for the specified number of layers', default=0)
 parser.add_argument('-A', '--alod', type=int, help='enables ALOD clauses', default=0)
 parser.add_argument('-f', '--foreign', help='foreign clauses', action='store_true')
+parser.add_argument('--foreignenc', help="encoding of the foreign clauses: long (one clause per ball) or aux (shared 'color >= m' variables per cell and row segment, defined in proofs/<output>-foreign.drat)", default='long')
 parser.add_argument('--symver', help='name for the symmetry verification file', default=None)
-parser.add_argument('-B', '--borderones', type=int, help='maximum number of ones in the border', default=0)
+parser.add_argument('-B', '--borderones', type=int, help='maximum number of ones in the border (encoded with --cardenc, seqcounter by default)', default=0)
+parser.add_argument('--cardenc', help='encoding of the border bound: combinations (one clause per subset, the encoding before --cardenc existed) or a pysat cardinality encoding', choices=structured_api.CARD_ENCODINGS, default='seqcounter')
 parser.add_argument('-C', '--chessboard', help='forces the chessboard pattern of 1s', action='store_true')
 parser.add_argument('--singlecolor', type=int, help='specify a single color for clauses', default=None)
+parser.add_argument('-g', '--geometry', help='geometry (diamond, or torus of side radius x height)', type=str, default="diamond")
+parser.add_argument('--height', help='height of the torus (defaults to the radius)', type=int, default=None)
+parser.add_argument('--amo', help='encoding of the residual conflicts: pairwise, sequential, commander or product (at-most-one constraints over cliques)', default='pairwise')
+parser.add_argument('--amostride', type=int, help='distance between the anchors of the candidate cliques for --amo', default=1)
+parser.add_argument('--centers', help="encodes once for several center colors ('all' or a comma-separated list), see --centermode; -c is then ignored", default=None)
+parser.add_argument('--centermode', help="icnf: one formulas/<output>-centers.icnf with a cube per center color; files: formulas/<output>-<c>.cnf and proofs/<output>-<c>.drat per center color", default='icnf')
+parser.add_argument('--lrat', help='direct encoding the proofs start from (e.g. formulas/direct-6-11.cnf); also writes them as LRAT, with clause IDs and hints', default=None)
+parser.add_argument('--lratstart', type=int, help='first clause ID for the LRAT lemmas (defaults to right after the direct encoding, set it higher when other proofs come first)', default=None)
+parser.add_argument('--selfcheck', help='checks the proof lines of each color against the direct encoding (in parallel) after writing them', action='store_true')
+parser.add_argument('--segments', help='also writes the ALOD and re-encoding proofs as one independent segment per color (proofs/<output>-c<color>.drat, with its premises in formulas/<output>-c<color>-direct.cnf) and a manifest for check_segments.py', action='store_true')
+parser.add_argument('-p', '--preprocess', help='removes duplicate and subsumed clauses and propagates units before writing (deletions go to the proof)', action='store_true')
+parser.add_argument('--dry-run', help='only counts the variables, clauses, literals and proof lines of each placement (no clauses are built, no files written)', action='store_true')
 args = parser.parse_args()
 
 radius = args.radius
 n_colors = args.colors
-input_file = args.input
+input_file = args.input[0]
 output_file = args.output
+assert len(args.input) == 1 or args.dry_run, 'several placements (-i) need --dry-run'
+assert output_file is not None or args.dry_run, 'the output basename (-o) is required'
+assert not (args.dry_run and (args.preprocess or args.lrat is not None)), '--dry-run counts the formula before -p, without --lrat'
 verbose = args.verbose
 minimization = args.minimization
 alod_clauses = args.alod
@@ -43,37 +71,100 @@ assert center_force >= -1 and center_force <= n_colors
 border_ones = args.borderones
 chessboard = args.chessboard
 singlecolor = args.singlecolor
+geometry = args.geometry
+period = (radius, args.height if args.height is not None else radius) if geometry == "torus" else None
+centers = structured_api.parse_centers(args.centers, n_colors, args.centermode)
+if centers is not None:
+    assert colors_to_split is None and not args.preprocess and args.lrat is None and singlecolor is None, "--centers does not support -T, -p, --lrat or --singlecolor"
+if (args.shards or args.sharedbase) and (colors_to_split is None or singlecolor is not None):
+    parser.error('--shards and --sharedbase split the cubes of -T (without --singlecolor)')
+if args.sharedbase and not args.shards:
+    parser.error('--sharedbase needs --shards')
 
 if verbose > 0:
     for v in vars(args):
         print(f'{v} = {getattr(args,v)}')
 
+def count_formula(placement_map):
+    # sizes of the formula and proofs this script would write, counted without building clauses
+    structurer = structured_api.Structure(radius, n_colors, symmetry, period, args.amo, args.amostride)
+    counts = structurer.count_conflict_clauses(placement_map, singlecolor)
+    counts['alod_lines'], counts['alod_literals'] = 0, 0
+    def add(size, in_proof=False):
+        counts['clauses'] += size[0]
+        counts['literals'] += size[1]
+        if in_proof:
+            counts['proof_lines'] += size[0]
+            counts['proof_literals'] += size[1]
+    if singlecolor is None:
+        add((len(structurer.positions), len(structurer.positions)*n_colors))
+    if centers is None and center_force != -1:
+        add((1, 1), True)
+    if alod_clauses:
+        counts['alod_lines'], counts['alod_literals'] = structurer.count_alod(alod_clauses)
+        add((counts['alod_lines'], counts['alod_literals']))
+    if minimization:
+        add(structurer.count_minimization(), True)
+    if foreign and args.foreignenc == 'aux':
+        stats = {}
+        structurer.foreign_aux_clauses(stats)
+        add((stats['clauses'], stats['literals']))
+    elif foreign:
+        add(structurer.count_foreign())
+    if symmetry:
+        add(structurer.count_symmetry_breaking())
+    if border_ones:
+        add(structurer.count_bounded_border_ones(border_ones, args.cardenc))
+    if chessboard:
+        add(structurer.count_chessboard())
+    counts['vars'] = len(structurer.V)
+    return counts
+
+if args.dry_run:
+    start = time.time()
+    for filename in args.input:
+        c = count_formula(structured_api.read_placement(filename))
+        print(f"{filename}: {c['vars']} vars, {c['clauses']} clauses, {c['literals']} literals, "
+              f"proof {c['proof_lines']} lines ({c['proof_literals']} literals), alod proof {c['alod_lines']} lines ({c['alod_literals']} literals)")
+    seconds = time.time() - start
+    print(f'{len(args.input)} placements counted in {seconds:.2f}s ({len(args.input)/max(seconds, 1e-9):.1f} per second)')
+    sys.exit(0)
 
 basepath = os.path.basename(output_file)
 
-structurer = structured_api.Structure(radius, n_colors, symmetry)
+assert args.amo in amo.ENCODINGS and args.foreignenc in ['long', 'aux']
+structurer = structured_api.Structure(radius, n_colors, symmetry, period, args.amo, args.amostride)
 
 clauses = []
 if singlecolor is None:
     clauses = structurer.long_clauses()
-with open(input_file, 'r') as f:
-    placement_map_json = json.load(f)
-
-
-placement_map = {}
-for k,v in placement_map_json.items():
-    placement_map[int(k)] = list(map(lambda x: list(map(tuple, x)), v))
+placement_map = structured_api.read_placement(input_file)
 
 
-conflict_clauses, conflict_proof = structurer.conflict_clauses(placement_map, singlecolor)
+proof_hints = None
+if args.lrat is not None:
+    assert not minimization and not args.preprocess and args.amo == 'pairwise', "LRAT output is not supported with -m, -p or --amo"
+    proof_hints = []
+conflict_clauses, conflict_proof = structurer.conflict_clauses(placement_map, singlecolor, proof_hints)
 clauses.extend(conflict_clauses)
+if args.amo != 'pairwise' and verbose > 0:
+    stats = structurer.amo_stats
+    print(f"amo ({args.amo}): {stats.get('cliques', 0)} cliques, {stats.get('vars', 0)} new variables, {stats.get('clauses', 0)} clauses replacing {stats.get('replaced', 0)} binary clauses")
 proof = conflict_proof
 alod_proof = []
 
-if center_force != -1:
+center_line = None
+center_at = len(clauses) # where the center unit goes, for --centers
+proof_center_at = len(proof)
+if centers is not None:
+    pass
+elif center_force != -1:
     center_clause = structurer.center_force(center_force) 
     clauses.append(center_clause)
+    center_line = len(proof)
     proof.append(center_clause)
+    if proof_hints is not None: # the direct encoding forces the center as well
+        proof_hints.append(('rup', [center_clause]))
 
 if alod_clauses:
     alod_cls = structurer.alod_clauses(alod_clauses)
@@ -85,17 +176,25 @@ if minimization:
     clauses.extend(min_clauses)
     proof.extend(min_clauses) #todo not abstractly correct
 
-if foreign:
+foreign_proof = None
+if foreign and args.foreignenc == 'aux':
+    stats = {}
+    foreign_clauses, foreign_proof = structurer.foreign_aux_clauses(stats)
+    clauses.extend(foreign_clauses)
+    print(f"foreign (aux): {stats['clauses']} clauses, {stats['literals']} literals, {stats['vars']} new variables, "
+          f"instead of {stats['long_clauses']} clauses, {stats['long_literals']} literals ({stats['long_literals'] - stats['literals']} literals saved)")
+elif foreign:
     foreign_clauses = structurer.foreign_clauses()
     clauses.extend(foreign_clauses)
 
+symmetry_clauses = []
 if symmetry:
     symmetry_clauses = structurer.symmetry_breaking()
     structurer.symmetry_verification('proofs/'+ basepath + ".symver" )
     clauses.extend(symmetry_clauses)
 
 if border_ones:
-    border_clauses = structurer.bounded_border_ones(border_ones)
+    border_clauses = structurer.bounded_border_ones(border_ones, args.cardenc)
     clauses.extend(border_clauses)
 
 if chessboard:
@@ -121,6 +220,45 @@ def cubes_to_file(clauses, cubes, filename):
         f.write(clauses_to_str(clauses))
         f.write(cubes_to_str(cubes))
 
+def shard_cubes(cubes, n_shards, mode):
+    # list of (slice of cube indices, cubes) per shard
+    if mode == 'roundrobin':
+        return [(slice(i, len(cubes), n_shards), cubes[i::n_shards]) for i in range(n_shards)]
+    size, extra = divmod(len(cubes), n_shards)
+    ans, start = [], 0
+    for i in range(n_shards):
+        end = start + size + (1 if i < extra else 0)
+        ans.append((slice(start, end, 1), cubes[start:end]))
+        start = end
+    return ans
+
+def shards_to_files(clauses, cubes, n_shards, mode, basename, shared_base=None):
+    # each shard is either a complete .icnf (clauses + its cubes) or, with a shared base,
+    # a .cubes file with only its cubes; the manifest lists cube counts and checksums.
+    shards = []
+    body = None if shared_base is not None else clauses_to_str(clauses)
+    for i, (indices, shard) in enumerate(shard_cubes(cubes, n_shards, mode)):
+        if shared_base is not None:
+            filename = f'{basename}-shard-{i}.cubes'
+            content = cubes_to_str(shard)
+        else:
+            filename = f'{basename}-shard-{i}.icnf'
+            content = 'p inccnf\n' + body + cubes_to_str(shard)
+        content = content.encode()
+        with open(filename, 'wb') as f:
+            f.write(content)
+        shards.append({
+            'file': os.path.basename(filename),
+            'cubes': len(shard),
+            'cube_indices': {'start': indices.start, 'stop': indices.stop, 'step': indices.step},
+            'sha256': hashlib.sha256(content).hexdigest(),
+        })
+    manifest = {'mode': mode, 'cubes': len(cubes), 'shards': shards}
+    if shared_base is not None:
+        manifest['base'] = {'file': os.path.basename(shared_base), 'sha256': sha256_of(shared_base)}
+    with open(basename + '-shards.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+
 def proof_to_file(proof, proof_filename):
     with open(proof_filename, 'w') as f:
         for line in proof:
@@ -128,14 +266,113 @@ def proof_to_file(proof, proof_filename):
             f.write(fline + '\n')
 
 
-cnf = CNF(from_clauses=clauses)
+if args.preprocess:
+    stats = {}
+    n_before = len(clauses)
+    clauses, preprocess_proof = preprocess.preprocess(clauses, stats=stats)
+    proof.extend(preprocess_proof)
+    print(f'# clauses before preprocessing = {n_before}')
+    if verbose > 0:
+        for k, v in stats.items():
+            print(f'  {k} = {v}')
+
 print(f'# clauses = {len(clauses)}')
-cnf.to_file('formulas/' + basepath + '.cnf')
+if centers is None:
+    cnf = CNF(from_clauses=clauses)
+    cnf.to_file('formulas/' + basepath + '.cnf')
+elif args.centermode == 'files':
+    # see structured_api.parse_centers (hard links cannot be used, since the unit is in the middle of the files)
+    prefix, suffix = clauses_to_str(clauses[:center_at]), clauses_to_str(clauses[center_at:])
+    proof_prefix, proof_suffix = clauses_to_str(proof[:proof_center_at]), clauses_to_str(proof[proof_center_at:])
+    n_vars = max((abs(lit) for clause in clauses for lit in clause), default=0)
+    for c in centers:
+        center_clause = structurer.center_force(c)
+        with open(f'formulas/{basepath}-{c}.cnf', 'w') as f:
+            f.write(f'p cnf {max(n_vars, abs(center_clause[0]))} {len(clauses)+1}\n')
+            f.write(prefix + clauses_to_str([center_clause]) + suffix)
+        with open(f'proofs/{basepath}-{c}.drat', 'w') as f:
+            f.write(proof_prefix + clauses_to_str([center_clause]) + proof_suffix)
+else:
+    cubes_to_file(clauses, [structurer.center_force(c) for c in centers], 'formulas/' + basepath + '-centers.icnf')
+    print(f'# centers = {len(centers)}')
 
 if singlecolor is None:
     if colors_to_split is not None:
         cubes = structurer.cubes(colors_to_split, positive_lits, placement_map, n_new_vars_to_split, reverse_cubes, center_force)
         print(f'# cubes = {len(cubes)}')
         cubes_to_file(clauses, cubes, 'formulas/' + basepath + '.icnf')
-    proof_to_file(proof, 'proofs/' + basepath + '.drat')
+        if args.shards:
+            shared_base = 'formulas/' + basepath + '.cnf' if args.sharedbase else None
+            shards_to_files(clauses, cubes, args.shards, args.shardmode, 'formulas/' + basepath, shared_base)
+            print(f'# shards = {args.shards}')
+    if centers is None or args.centermode == 'icnf': # otherwise written with the formulas
+        proof_to_file(proof, 'proofs/' + basepath + '.drat')
     proof_to_file(alod_proof, 'proofs/' + basepath + '-alod.drat')
+    if foreign_proof is not None:
+        proof_to_file(foreign_proof, 'proofs/' + basepath + '-foreign.drat')
+    if args.lrat is not None:
+        # same order as the DRAT proofs: ALOD first, then the re-encoding
+        writer = lrat.LratWriter(args.lrat, args.lratstart)
+        writer.write(alod_proof, [None]*len(alod_proof), 'proofs/' + basepath + '-alod.lrat')
+        writer.write(proof, proof_hints, 'proofs/' + basepath + '.lrat')
+
+owner = {v: k for k, v in structurer.V.items()}
+def color_of(lit):
+    return owner[abs(lit)][1]
+
+def color_segments():
+    # the proof lines of each color only use its variables and its new variables, so they can be checked
+    # on their own: from the direct conflicts of the color (plus the symmetry breaking clauses on it and
+    # the center, which come first in the full proof), its ALOD lines then its lines of the re-encoding.
+    # A symmetry breaking clause goes with the color of its only negative literal, the one whose symmetry
+    # it breaks; its positive literals, of higher colors, are the only ones shared between segments.
+    # Lines outside of the colors (-m, -p) are left out. Returns (color, premises, lines) for each color.
+    segments = []
+    for color, (start, end) in structurer.proof_segments.items():
+        formula = structurer.direct_conflicts(color)
+        formula += [clause for clause in symmetry_clauses if color_of(min(clause)) == color]
+        lines = [(basepath + '-alod.drat', idx+1, line) for idx, line in enumerate(alod_proof) if color_of(line[0]) == color]
+        lines += [(basepath + '.drat', idx+1, proof[idx]) for idx in range(start, end)]
+        if center_line is not None and color_of(center_clause[0]) == color:
+            formula.append(center_clause)
+            lines.append((basepath + '.drat', center_line+1, center_clause))
+        segments.append((color, formula, lines))
+    return segments
+
+if args.segments:
+    assert singlecolor is None and centers is None, "--segments does not support --singlecolor or --centers"
+    entries = []
+    for color, formula, lines in color_segments():
+        formula_file = f'formulas/{basepath}-c{color}-direct.cnf'
+        proof_file = f'proofs/{basepath}-c{color}.drat'
+        CNF(from_clauses=formula).to_file(formula_file)
+        proof_to_file([line for _, _, line in lines], proof_file)
+        # paths are relative to the manifest, in proofs/
+        entries.append({'color': color, 'formula': os.path.relpath(formula_file, 'proofs'), 'proof': os.path.relpath(proof_file, 'proofs'),
+                        'premises': len(formula), 'lines': len(lines), 'formula_sha256': sha256_of(formula_file), 'proof_sha256': sha256_of(proof_file)})
+    manifest = {
+        'formula': os.path.join('..', 'formulas', basepath + '.cnf'),
+        'proofs': [basepath + '-alod.drat', basepath + '.drat'],
+        # how the segments add up to the proofs: their premises are clauses of the direct encoding, or
+        # derived by the symmetry breaking proof. They only share the higher colors of the symmetry
+        # breaking clauses, and check_segments.py rejects RAT on the negation of a shared literal, so
+        # that their lines can be checked in any order, in parallel, in place of the proofs
+        'composition': 'symmetry breaking proof, then the segments in any order',
+        'unchecked': (['minimization (-m)'] if minimization else []) + (['preprocessing (-p)'] if args.preprocess else []),
+        'segments': entries,
+    }
+    with open('proofs/' + basepath + '-segments.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f'# segments = {len(entries)}')
+
+if args.selfcheck:
+    jobs = [(color, formula, lines, 'minisat22') for color, formula, lines in color_segments()]
+    n_lines = sum(len(job[2]) for job in jobs)
+    failures = selfcheck.check_all(jobs)
+    for color, (name, number, lits) in failures:
+        var = next((lit for lit in lits if lit != 'd' and isinstance(owner.get(abs(lit), (None,))[0], tuple)), None)
+        where = f', position {owner[abs(var)][0]}' if var is not None else ''
+        print(f'selfcheck: line {number} of {name} (color {color}{where}) is neither RUP nor RAT: {lits}')
+    if failures:
+        sys.exit(1)
+    print(f'selfcheck: {n_lines} lines of {len(jobs)} colors verified')
@@ -0,0 +1,80 @@
+import time
+from pysat.solvers import Solver
+
+class ColorSweep:
+    # one solver for a formula built with structurer.colors colors, queried for fewer colors
+    # under assumptions, so that clauses learned for k colors are kept when trying k-1.
+    # the ALOD clauses (up to color alod) are added here since they only hold while their color is used.
+    def __init__(self, structurer, clauses, min_colors=1, center_force=0, solver='cadical153', alod=0):
+        self.structurer = structurer
+        self.min_colors = min_colors
+        self.center_force = center_force
+        self.clauses = clauses + structurer.activation_clauses(min_colors)
+        key_of = {var: key for key, var in structurer.V.items()}
+        for clause in structurer.alod_clauses(alod) if alod else []:
+            # the first literal is a position of the color of the clause; above min_colors, guarded by its activation variable
+            color = key_of[clause[0]][1]
+            self.clauses.append(clause + ([-1*structurer.V[('a', color)]] if color > min_colors else []))
+        self.solver = Solver(name=solver, bootstrap_with=self.clauses)
+
+    def solve(self, colors):
+        assert self.min_colors <= colors <= self.structurer.colors
+        return self.solver.solve(assumptions=self.structurer.sweep_assumptions(colors, self.center_force))
+
+    def get_model(self):
+        return self.solver.get_model()
+
+    def sweep(self, max_colors=None, min_colors=None, stop_at_unsat=True):
+        # yields (colors, result, seconds, conflicts) for colors = max_colors, max_colors-1, ...
+        if max_colors is None:
+            max_colors = self.structurer.colors
+        if min_colors is None:
+            min_colors = self.min_colors
+        for colors in range(max_colors, min_colors-1, -1):
+            conflicts = self.solver.accum_stats().get('conflicts', 0)
+            start = time.time()
+            result = self.solve(colors)
+            yield colors, result, time.time() - start, self.solver.accum_stats().get('conflicts', 0) - conflicts
+            if stop_at_unsat and not result:
+                break
+
+    def delete(self):
+        self.solver.delete()
+
+class RadiusSweep:
+    # one solver for D_r, D_{r+1}, ...: the board is grown a ring at a time by adding clauses only
+    # (structurer.grow and structurer.layer_clauses, the structurer has the layered numbering), so that
+    # clauses learned for a radius are kept for the next ones. options go to layer_clauses.
+    def __init__(self, structurer, solver='cadical153', **options):
+        self.structurer = structurer
+        self.options = options
+        self.clauses = structurer.layer_clauses(structurer.positions, **options)
+        self.solver = Solver(name=solver, bootstrap_with=self.clauses)
+
+    def grow(self):
+        # returns the clauses added for the new radius
+        ring = self.structurer.grow()
+        clauses = self.structurer.layer_clauses(ring, **self.options)
+        self.solver.append_formula(clauses)
+        self.clauses.extend(clauses)
+        return clauses
+
+    def solve(self):
+        return self.solver.solve(assumptions=[self.structurer.layer_literal()])
+
+    def get_model(self):
+        return self.solver.get_model()
+
+    def sweep(self, max_radius, stop_at_unsat=True):
+        # yields (radius, result, seconds, conflicts) for radius = structurer.radius, ..., max_radius
+        while True:
+            conflicts = self.solver.accum_stats().get('conflicts', 0)
+            start = time.time()
+            result = self.solve()
+            yield self.structurer.radius, result, time.time() - start, self.solver.accum_stats().get('conflicts', 0) - conflicts
+            if (stop_at_unsat and not result) or self.structurer.radius >= max_radius:
+                break
+            self.grow()
+
+    def delete(self):
+        self.solver.delete()
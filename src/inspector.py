@@ -0,0 +1,129 @@
+import argparse
+import os
+import tempfile
+import numpy as np
+import dimacs
+
+parser = argparse.ArgumentParser(description="Statistics of a .cnf, .icnf or DRAT file, or a structural diff of two formulas, in bounded memory.")
+parser.add_argument('input', help='.cnf, .icnf or (text) DRAT file')
+parser.add_argument('--diff', help='second file: counts the clauses (and cubes) only in one of the two, as sets', default=None)
+parser.add_argument('--show', type=int, help='number of clauses printed for each side of the diff, and of most frequent variables', default=10)
+parser.add_argument('--memory', type=int, help='memory budget in MB for the clause hashes (beyond it, they are spilled to disk in partitions)', default=512)
+parser.add_argument('--chunk', type=int, help='size in MB of the blocks the files are parsed in', default=16)
+args = parser.parse_args()
+
+chunk_size = args.chunk << 20
+
+def header(filename):
+    with open(filename, 'rb') as f:
+        for line in f:
+            if line.startswith(b'p '):
+                return line.decode().split()[1:]
+            if not line.startswith(b'c'):
+                return None
+    return None
+
+def grow_add(total, counts):
+    # total + counts for bincount arrays of different lengths
+    if len(counts) > len(total):
+        total, counts = counts, total
+    total = total.copy()
+    total[:len(counts)] += counts
+    return total
+
+def hash_partitions(filename, n_partitions, directory, stats=None):
+    # one pass over the file: the hashes of its clauses and cubes (not deletions) go to n_partitions
+    # files according to their value modulo n_partitions, so that each partition can be handled in memory on its own;
+    # with stats, also accumulates the histograms and occurrence counts
+    names = [os.path.join(directory, f'{len(os.listdir(directory))}-{i}.u64') for i in range(n_partitions)]
+    files = [open(name, 'wb') for name in names]
+    for lits, lengths, kinds in dimacs.read_line_chunks(filename, chunk_size):
+        hashes = dimacs.clause_hashes(lits, lengths, kinds)[kinds != dimacs.DELETION]
+        partition = (hashes % np.uint64(n_partitions)).astype(np.int64)
+        for i in range(n_partitions):
+            hashes[partition == i].tofile(files[i])
+        if stats is not None:
+            for kind in [dimacs.CLAUSE, dimacs.CUBE, dimacs.DELETION]:
+                stats['lines'][kind] += int((kinds == kind).sum())
+                stats['lengths'][kind] = grow_add(stats['lengths'][kind], np.bincount(lengths[kinds == kind]))
+            counted = np.repeat(kinds == dimacs.CLAUSE, lengths)
+            stats['positive'] = grow_add(stats['positive'], np.bincount(lits[counted & (lits > 0)]))
+            stats['negative'] = grow_add(stats['negative'], np.bincount(-lits[counted & (lits < 0)]))
+    for f in files:
+        f.close()
+    return names
+
+def n_partitions_for(*filenames):
+    # a hash takes 8 bytes, about the size of the shortest clause lines
+    size = sum(os.path.getsize(filename) for filename in filenames)
+    return max(1, -(-size // (max(1, args.memory) << 20)))
+
+def clauses_with_hashes(filename, selected, limit):
+    # second pass: the first limit lines whose hash is in selected (a sorted array)
+    found = []
+    if limit <= 0 or len(selected) == 0:
+        return found
+    for lits, lengths, kinds in dimacs.read_line_chunks(filename, chunk_size):
+        hashes = dimacs.clause_hashes(lits, lengths, kinds)
+        hit = np.flatnonzero(np.isin(hashes, selected) & (kinds != dimacs.DELETION))
+        starts = dimacs.clause_starts(lengths)
+        for k in hit[:limit - len(found)]:
+            found.append(('a ' if kinds[k] == dimacs.CUBE else '') + ' '.join(map(str, lits[starts[k]:starts[k]+lengths[k]])) + ' 0')
+        if len(found) >= limit:
+            break
+    return found
+
+def print_histogram(name, lengths):
+    print(f'{name} lengths:')
+    for length in np.flatnonzero(lengths):
+        print(f'  {length}: {lengths[length]}')
+
+with tempfile.TemporaryDirectory() as directory:
+    if args.diff is None:
+        stats = {'lines': [0, 0, 0], 'lengths': [np.zeros(1, dtype=np.int64) for _ in range(3)],
+                 'positive': np.zeros(1, dtype=np.int64), 'negative': np.zeros(1, dtype=np.int64)}
+        partitions = hash_partitions(args.input, n_partitions_for(args.input), directory, stats)
+        duplicates = 0
+        for name in partitions:
+            hashes = np.fromfile(name, dtype=np.uint64)
+            duplicates += len(hashes) - len(np.unique(hashes))
+        lines, lengths = stats['lines'], stats['lengths']
+        print(f'{args.input}: header {" ".join(header(args.input) or ["(none)"])}')
+        print(f'# clauses = {lines[dimacs.CLAUSE]}, # cubes = {lines[dimacs.CUBE]}, # deletions = {lines[dimacs.DELETION]}')
+        print(f'# literals = {int((lengths[dimacs.CLAUSE]*np.arange(len(lengths[dimacs.CLAUSE]))).sum())}, # duplicate clauses and cubes = {duplicates}')
+        print_histogram('clause', lengths[dimacs.CLAUSE])
+        if lines[dimacs.CUBE]:
+            print_histogram('cube', lengths[dimacs.CUBE])
+        if lines[dimacs.DELETION]:
+            print_histogram('deletion', lengths[dimacs.DELETION])
+        positive = np.pad(stats['positive'], (0, max(0, len(stats['negative']) - len(stats['positive']))))
+        negative = np.pad(stats['negative'], (0, len(positive) - len(stats['negative'])))
+        occurrences = positive + negative
+        print(f'# variables = {int((occurrences > 0).sum())} (max {len(occurrences)-1}), '
+              f'# pure = {int(((positive > 0) != (negative > 0)).sum())}')
+        order = np.argsort(-occurrences, kind='stable')[:args.show]
+        print('most frequent variables: ' + ', '.join(f'{var} ({positive[var]}+/{negative[var]}-)' for var in order if occurrences[var] > 0))
+    else:
+        n_partitions = n_partitions_for(args.input, args.diff)
+        partitions_a = hash_partitions(args.input, n_partitions, directory)
+        partitions_b = hash_partitions(args.diff, n_partitions, directory)
+        # the counts are exact; the hashes kept to print examples are capped to half of the budget
+        cap = (max(1, args.memory) << 20) // 16
+        n_only_a, n_only_b, common = 0, 0, 0
+        examples_a, examples_b = [], []
+        for name_a, name_b in zip(partitions_a, partitions_b):
+            hashes_a = np.unique(np.fromfile(name_a, dtype=np.uint64))
+            hashes_b = np.unique(np.fromfile(name_b, dtype=np.uint64))
+            only_a = np.setdiff1d(hashes_a, hashes_b, assume_unique=True)
+            only_b = np.setdiff1d(hashes_b, hashes_a, assume_unique=True)
+            n_only_a, n_only_b = n_only_a + len(only_a), n_only_b + len(only_b)
+            common += len(hashes_a) - len(only_a)
+            examples_a.append(only_a[:max(0, cap - sum(map(len, examples_a)))])
+            examples_b.append(only_b[:max(0, cap - sum(map(len, examples_b)))])
+        print(f'# distinct clauses and cubes in both = {common}, only in {args.input} = {n_only_a}, only in {args.diff} = {n_only_b}')
+        for filename, examples in [(args.input, examples_a), (args.diff, examples_b)]:
+            selected = np.sort(np.concatenate(examples))
+            if len(selected):
+                print(f'only in {filename}:')
+                for line in clauses_with_hashes(filename, selected, args.show):
+                    print('  ' + line)
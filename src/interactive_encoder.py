@@ -105,7 +105,7 @@ class InteractiveEncoder:
         # Structurer! :)
         self.structurer = structured_api.Structure(self.radius, self.colors)
         self.proof = []
-        self.update_clauses() # note that this needs to go after the creation of the clauses_label, as it updates its value
+        self.update_counts() # note that this needs to go after the creation of the clauses_label, as it updates its value
 
         # active color selector
         self.color_selector_frame = tkinter.Frame(self.pannel)
@@ -175,7 +175,7 @@ class InteractiveEncoder:
         # check that new_var is within borders
         if structured_api.all_distances_leq(new_var, [(0, 0)], self.radius):        
             self.new_vars_per_color[self.active_color].append(new_var)
-            #self.update_clauses()
+            self.update_counts()
             self.update_plot()
 
     def update_clauses(self):
@@ -203,6 +203,21 @@ class InteractiveEncoder:
             self.proof.append(center_clause)
         self.clauses_label_var.set(f'#vars = {n_vars_from_clauses(self.clauses)}, #clauses = {len(self.clauses)}')
 
+    def update_counts(self):
+        # same label as update_clauses, counted without building the clauses (cheap enough for every click)
+        if evan_clauses:
+            self.update_clauses()
+            return
+        counts = self.structurer.count_conflict_clauses(self.new_vars_per_color)
+        n_clauses = len(self.structurer.positions) + counts['clauses']
+        if minimization:
+            n_clauses += self.structurer.count_minimization()[0]
+        if symmetry:
+            n_clauses += self.structurer.count_symmetry_breaking()[0]
+        if center_force != -1:
+            n_clauses += 1
+        self.clauses_label_var.set(f'#vars = {len(self.structurer.positions)*self.colors + counts["vars"]}, #clauses = {n_clauses}')
+
     def update_plot(self):
         self.canvas.delete('all')
         mh = self.canvas.winfo_reqwidth()//2
@@ -242,13 +257,14 @@ class InteractiveEncoder:
             return
         for color in range(bgn, end+1):
             self.new_vars_per_color[color] = list(self.new_vars_per_color[self.active_color])
-        self.update_clauses()
+        self.update_counts()
 
     def export(self):
         filename = asksaveasfilename()
         self.canvas.postscript(file = filename + '.eps') 
         img = Image.open(filename + '.eps')
         img.save(filename + '.png', 'png') 
+        self.update_clauses()
         cnf = CNF(from_clauses=self.clauses)
         cnf.to_file(filename)
         proof_to_file(self.proof, filename+'.drat')
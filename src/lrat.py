@@ -0,0 +1,87 @@
+import dimacs
+
+class LratWriter:
+    # Turns DRAT proof lines into LRAT, given a justification for each line:
+    #  - None: no hints (deletions, or RAT steps where every candidate clause gives a tautology)
+    #  - ('rup', clauses): the lemma is RUP using these clauses
+    #  - ('rat', [(candidate, clauses), ...]): RAT on the first literal, the resolvent with each
+    #    candidate (a clause containing the negated pivot) being RUP using the given clauses.
+    # The clauses are given by their literals, the writer looks up their IDs; the clauses of the
+    # formula the proof starts from are numbered 1, 2, ... in file order, and the lemmas after
+    # start_id (by default right after the formula).
+    # Hints are put in the order in which the clauses become unit.
+    def __init__(self, formula_file, start_id=None):
+        self.ids = {}
+        lits, lengths = dimacs.read_clauses(formula_file)
+        for idx, clause in enumerate(dimacs.split_clauses(lits, lengths)):
+            self.register(clause.tolist(), idx+1)
+        self.next_id = start_id if start_id is not None else len(lengths) + 1
+
+    def register(self, clause, idx):
+        key = tuple(sorted(set(clause)))
+        if key not in self.ids:
+            self.ids[key] = []
+        self.ids[key].append(idx)
+
+    def id_of(self, clause):
+        key = tuple(sorted(set(clause)))
+        if not self.ids.get(key):
+            raise KeyError(f'clause {clause} is not in the proof state')
+        return self.ids[key][-1]
+
+    def ids_of(self, clause):
+        return list(self.ids.get(tuple(sorted(set(clause))), []))
+
+    def unit_chain(self, lemma, assigned, clauses):
+        # IDs of the clauses that become unit under the assignment and then falsify one
+        assigned = set(assigned)
+        remaining = list(clauses)
+        hints = []
+        progress = True
+        while progress:
+            progress = False
+            for clause in list(remaining):
+                if any(lit in assigned for lit in clause):
+                    continue
+                free = [lit for lit in clause if -lit not in assigned]
+                if len(free) > 1:
+                    continue
+                hints.append(self.id_of(clause))
+                if len(free) == 0:
+                    return hints
+                assigned.add(free[0])
+                remaining.remove(clause)
+                progress = True
+        raise ValueError(f'no unit propagation refutes the negation of {lemma}')
+
+    def lines(self, proof, hints):
+        for line, hint in zip(proof, hints):
+            if len(line) > 0 and line[0] == 'd':
+                key = tuple(sorted(set(line[1:])))
+                if not self.ids.get(key):
+                    raise KeyError(f'deleted clause {line[1:]} is not in the proof state')
+                yield f'{self.next_id - 1} d {self.ids[key].pop()} 0\n'
+                continue
+            negated = [-lit for lit in line]
+            ids = []
+            if hint is not None and hint[0] == 'rup':
+                ids = self.unit_chain(line, negated, hint[1])
+            elif hint is not None and hint[0] == 'rat':
+                pivot = line[0]
+                for candidate, clauses in hint[1]:
+                    resolvent = [lit for lit in candidate if lit != -pivot]
+                    if any(-lit in line for lit in resolvent):
+                        continue # tautological resolvent, nothing to check
+                    assigned = negated + [-lit for lit in resolvent]
+                    chain = self.unit_chain(line, assigned, clauses)
+                    for idx in self.ids_of(candidate):
+                        ids += [-idx] + chain
+            idx = self.next_id
+            self.next_id += 1
+            self.register(line, idx)
+            yield ' '.join(map(str, [idx] + line + [0] + ids + [0])) + '\n'
+
+    def write(self, proof, hints, filename):
+        assert len(proof) == len(hints)
+        with open(filename, 'w') as f:
+            f.writelines(self.lines(proof, hints))
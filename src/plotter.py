@@ -5,6 +5,8 @@ import matplotlib.patches as patches
 import matplotlib.colors as mcolors
 import matplotlib as mpl
 import os
+import numpy as np
+from dimacs import read_clause_chunks, clauses_to_arrays, clause_starts
 
 def create_positions(radius, color):
     V = {}
@@ -61,6 +63,111 @@ def visualize(M, text=True, title='Untitled', colors_to_use=None, fig=None):
     plt.gca().set_aspect('equal')
     return fig
         
+def raster_from_mat(M, colors_to_use, scale=8, grid=True):
+    # RGB image of M with scale x scale pixels per cell, row 0 at the bottom.
+    # Cells holding a list of values are split in horizontal bands, the first value at the bottom,
+    # as in visualize. Outside cells (negative) are white and empty ones (0) gray.
+    size = len(M)
+    depth = 1
+    for row in M:
+        for val in row:
+            if isinstance(val, list):
+                depth = max(depth, len(val))
+    stack = np.zeros((size, size, depth), dtype=np.int64)
+    counts = np.ones((size, size), dtype=np.int64)
+    for i in range(size):
+        for j in range(size):
+            val = M[i][j]
+            if isinstance(val, list):
+                if len(val) > 0:
+                    stack[i, j, :len(val)] = val
+                    counts[i, j] = len(val)
+            else:
+                stack[i, j, 0] = val if val >= 0 else -1
+
+    palette = np.array([(1, 1, 1), (0.5, 0.5, 0.5)] + [colors_to_use[c % len(colors_to_use)][:3] for c in range(max(1, stack.max()))])
+    cells = np.arange(size*scale) // scale
+    offsets = np.arange(size*scale) % scale
+    xs, ys = cells[None, :], cells[:, None]
+    bands = (offsets[:, None] * counts[xs, ys]) // scale
+    img = palette[stack[xs, ys, bands] + 1]
+    if grid and scale >= 4:
+        inside = stack[xs, ys, 0] >= 0
+        img[(offsets[:, None] == 0) & inside] = 0
+        img[(offsets[None, :] == 0) & inside] = 0
+    return img
+
+def visualize_raster(M, text=False, colors_to_use=None, fig=None, scale=8, view=None, max_labels=400):
+    # same picture as visualize, drawn as a single image; view = (xmin, xmax, ymin, ymax) zooms in,
+    # and labels are only drawn when at most max_labels cells are in view.
+    if colors_to_use is None:
+        colors_to_use = default_colors()
+    if fig is None:
+        fig = plt.figure(dpi=300)
+    ax = fig.add_subplot(aspect='equal')
+    radius = len(M)//2
+    ax.imshow(raster_from_mat(M, colors_to_use, scale), origin='lower', interpolation='nearest',
+              extent=(-radius-0.5, radius+0.5, -radius-0.5, radius+0.5))
+    ax.axis('off')
+    if view is None:
+        view = (-radius-1, radius+1, -radius-1, radius+1)
+    ax.set_xlim(view[:2])
+    ax.set_ylim(view[2:])
+    if text:
+        labels = []
+        for i in range(len(M)):
+            for j in range(len(M[0])):
+                x, y = i-radius, j-radius
+                if view[0] <= x <= view[1] and view[2] <= y <= view[3]:
+                    val = M[i][j]
+                    vals = val if isinstance(val, list) else ([val] if val > 0 else [])
+                    for k, v in enumerate(vals):
+                        labels.append((x, y-0.5+(1/len(vals))*k+1/(2*len(vals)), v))
+        if len(labels) <= max_labels:
+            for x, y, v in labels:
+                ax.text(x, y, v, ha='center', va='center', color='black', fontsize=6, clip_on=True)
+    return fig
+
+def export_pngs(mats, filenames, colors_to_use=None, scale=8):
+    # batch export, one image per matrix, without going through figures
+    if colors_to_use is None:
+        colors_to_use = default_colors()
+    for M, filename in zip(mats, filenames):
+        plt.imsave(filename, raster_from_mat(M, colors_to_use, scale), origin='lower')
+
+def export_placement_pngs(placement_map, radius, basename, colors_to_use=None, scale=8):
+    # one image per color of the placement, each cell listing the regions it belongs to
+    colors = [c for c in sorted(placement_map) if len(placement_map[c]) > 0]
+    mats = [mat_from_regions(placement_map[c], radius) for c in colors]
+    filenames = [f'{basename}-{c}.png' for c in colors]
+    export_pngs(mats, filenames, colors_to_use, scale)
+    return filenames
+
+def export_coloring_pngs(formula_files, radius, colors, colors_to_use=None, scale=8):
+    # permission maps of several formulas, each written next to its .cnf
+    mats, filenames = [], []
+    for filename in formula_files:
+        coloring, coloring_op = create_colorings_from_file(filename, radius, colors)
+        mats.append(mat_from_coloring(coloring, radius))
+        filenames.append(os.path.splitext(filename)[0] + '.png')
+    export_pngs(mats, filenames, colors_to_use, scale)
+    return filenames
+
+def mat_from_regions(regions, radius):
+    coloring = {}
+    for idx, region in enumerate(regions):
+        for position in region:
+            position = tuple(position)
+            if position not in coloring:
+                coloring[position] = []
+            coloring[position].append(idx+1)
+    return mat_from_coloring(coloring, radius)
+
+def default_colors():
+    # matplotlib color palette name, n colors
+    cmap = plt.get_cmap('tab20b')
+    return [cmap(i)[:3] for i in range(cmap.N)]
+
 def mat_from_coloring(coloring, radius):
     mat = [[-10 for _ in range(2*radius+1)] for _ in range(2*radius+1)]
     for i in range(-radius, radius+1):
@@ -76,45 +183,77 @@ def print_mat(mat):
     for row in mat:
         print(", ".join(list(map(str, row))))
 
-def create_colorings(clauses, radius, colors):
-    positions, V, IV = create_positions(radius, colors)
-    max_natural_var = len(V)
+def regional_pairs(lits, lengths, max_natural_var):
+    # selects the clauses made of exactly one natural literal (which then has
+    # the smallest variable) and at least one variable above max_natural_var,
+    # and returns, for each of them, the natural literal and the smallest unnatural one.
+    nonempty = lengths > 0
+    starts = clause_starts(lengths)[nonempty]
+    lengths = lengths[nonempty]
+    if len(lengths) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    natural = np.abs(lits) <= max_natural_var
+    key = 2*np.abs(lits) + (lits < 0) # literal encoded so that min() orders by variable
+    big = np.iinfo(np.int64).max
+    n_natural = np.add.reduceat(natural.astype(np.int64), starts)
+    nat_key = np.minimum.reduceat(np.where(natural, key, big), starts)
+    un_key = np.minimum.reduceat(np.where(natural, big, key), starts)
+    selected = (lengths >= 2) & (n_natural == 1)
+    nat_key, un_key = nat_key[selected], un_key[selected]
+    def to_lits(k):
+        return np.where(k % 2 == 1, -(k // 2), k // 2)
+    return to_lits(nat_key), to_lits(un_key)
 
-    def natural(v):
-        return abs(v) <= max_natural_var
+def colorings_from_pairs(nat_lits, un_lits, radius, colors):
+    positions, V, IV = create_positions(radius, colors)
+    # unnatural variables are numbered by order of first appearance
+    unnatural = np.abs(un_lits)
+    uniq, first, inverse = np.unique(unnatural, return_index=True, return_inverse=True)
+    rank = np.empty(len(uniq), dtype=np.int64)
+    rank[np.argsort(first)] = np.arange(1, len(uniq)+1)
+    ids = rank[inverse.reshape(-1)]
+    pos_idx = (np.abs(nat_lits) - 1) // colors
 
-    coloring = {}
-    coloring_op = {}
-    map_unnatural_variables = {}
-    G = nx.DiGraph()
-    for clause in clauses:
-        clause = list(sorted(clause, key=abs))
-        if len(clause) < 2 or natural(clause[1]): # fully natural clause
-            continue
-        if not natural(clause[0]): # fully unnatural clause
-            G.add_edge(-1*clause[0], clause[1])
-            continue
-
-        position, color = IV[abs(clause[0])]
-        if abs(clause[1]) not in map_unnatural_variables:
-                map_unnatural_variables[abs(clause[1])] = len(map_unnatural_variables) + 1
-        
-        # permission  natural -> permission from unnatural.  (not natural or unnatural)
-        if clause[1] > 0 and clause[0] < 0: # permission check
-            if position not in coloring:
-                coloring[position] = []
-            coloring[position].append(map_unnatural_variables[abs(clause[1])])
+    def to_map(mask):
+        mapping = {}
+        for p, v in zip(pos_idx[mask].tolist(), ids[mask].tolist()):
+            position = positions[p]
+            if position not in mapping:
+                mapping[position] = []
+            mapping[position].append(v)
+        return mapping
 
-        # prohibition natural -> forbid unnatural (not natural or not unnatural)
-        if clause[1] < 0 and clause[0] < 0: # prohibition check
-            if position not in coloring_op:
-                coloring_op[position] = []
-            coloring_op[position].append(map_unnatural_variables[abs(clause[1])])
+    # permission  natural -> permission from unnatural.  (not natural or unnatural)
+    coloring = to_map((un_lits > 0) & (nat_lits < 0))
+    # prohibition natural -> forbid unnatural (not natural or not unnatural)
+    coloring_op = to_map((un_lits < 0) & (nat_lits < 0))
     return coloring, coloring_op
 
+def create_colorings(clauses, radius, colors):
+    lits, lengths = clauses_to_arrays(clauses)
+    nat_lits, un_lits = regional_pairs(lits, lengths, (2*radius*(radius+1)+1)*colors)
+    return colorings_from_pairs(nat_lits, un_lits, radius, colors)
+
+def create_colorings_from_file(filename, radius, colors):
+    max_natural_var = (2*radius*(radius+1)+1)*colors
+    nat_parts, un_parts = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    for lits, lengths in read_clause_chunks(filename):
+        nat_lits, un_lits = regional_pairs(lits, lengths, max_natural_var)
+        nat_parts.append(nat_lits)
+        un_parts.append(un_lits)
+    return colorings_from_pairs(np.concatenate(nat_parts), np.concatenate(un_parts), radius, colors)
+
 
-def get_fig(clauses, radius, colors):
+def get_fig(clauses, radius, colors, raster=None):
     coloring, coloring_op = create_colorings(clauses, radius, colors)
+    return fig_from_coloring(coloring, radius, raster)
+
+def get_fig_from_file(filename, radius, colors, raster=None):
+    coloring, coloring_op = create_colorings_from_file(filename, radius, colors)
+    return fig_from_coloring(coloring, radius, raster)
+
+def fig_from_coloring(coloring, radius, raster=None):
     M = mat_from_coloring(coloring, radius)
     diff_values = set()
     for i in range(len(M)):
@@ -123,10 +262,9 @@ def get_fig(clauses, radius, colors):
                 for val in M[i][j]:
                     diff_values.add(val)
 
-    colors_to_use = []
-    # matplotlib color palette name, n colors
-    cmap = cm.get_cmap('tab20b')
-    for i in range(cmap.N):
-        colors_to_use.append(cmap(i)[:3])
-
+    colors_to_use = default_colors()
+    if raster is None:
+        raster = radius >= 15
+    if raster:
+        return visualize_raster(M, text=radius<10, colors_to_use=colors_to_use)
     return visualize(M, text=radius<10, title="Permission Clauses", colors_to_use=colors_to_use)
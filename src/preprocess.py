@@ -0,0 +1,87 @@
+def preprocess(clauses, units=True, subsumption=True, stats=None):
+    # Simplifies a clause list before it is written, returning (clauses, proof) where proof
+    # holds the DRAT lines turning the original clauses into the simplified ones.
+    # The order of the remaining clauses is kept.
+    #  - duplicates are dropped; no deletion line is emitted for them, since the remaining copy
+    #    is still in the formula (and identical copies in the proof do not affect the checks).
+    #  - units are propagated: satisfied clauses are deleted, falsified literals removed
+    #    (the shortened clause is RUP by the unit, then the original is deleted).
+    #  - clauses subsumed by another clause are deleted, using occurrence lists.
+    if stats is None:
+        stats = {}
+    proof = []
+    seen = set()
+    alive = []
+    for clause in clauses:
+        key = tuple(sorted(set(clause)))
+        if key in seen:
+            continue
+        seen.add(key)
+        alive.append(list(clause))
+    stats['duplicates'] = len(clauses) - len(alive)
+
+    if units:
+        alive = propagate_units(alive, proof, stats)
+    if subsumption:
+        alive = remove_subsumed(alive, proof, stats)
+    return alive, proof
+
+def propagate_units(clauses, proof, stats):
+    stats['satisfied'] = stats['shortened'] = 0
+    occurrences = {}
+    for idx, clause in enumerate(clauses):
+        for lit in clause:
+            if lit not in occurrences:
+                occurrences[lit] = []
+            occurrences[lit].append(idx)
+    assigned = set()
+    removed = [False]*len(clauses)
+    queue = [clause[0] for clause in clauses if len(clause) == 1]
+    while queue:
+        unit = queue.pop()
+        if unit in assigned:
+            continue
+        assigned.add(unit)
+        for idx in occurrences.get(unit, []):
+            if not removed[idx] and len(clauses[idx]) > 1:
+                proof.append(['d'] + clauses[idx])
+                removed[idx] = True
+                stats['satisfied'] += 1
+        for idx in occurrences.get(-unit, []):
+            if removed[idx]:
+                continue
+            shortened = [lit for lit in clauses[idx] if lit != -unit]
+            proof.append(shortened)
+            proof.append(['d'] + clauses[idx])
+            stats['shortened'] += 1
+            clauses[idx] = shortened
+            if len(shortened) == 0: # conflicting units, the empty clause is all that is left to say
+                return [[]]
+            if len(shortened) == 1:
+                queue.append(shortened[0])
+    return [clause for idx, clause in enumerate(clauses) if not removed[idx]]
+
+def remove_subsumed(clauses, proof, stats):
+    # backward subsumption: the candidates subsumed by C are the clauses in the
+    # occurrence lists of all of its literals, intersected starting from the shortest list
+    occurrences = {}
+    for idx, clause in enumerate(clauses):
+        for lit in clause:
+            if lit not in occurrences:
+                occurrences[lit] = set()
+            occurrences[lit].add(idx)
+    removed = set()
+    for idx in sorted(range(len(clauses)), key=lambda i: len(clauses[i])):
+        clause = clauses[idx]
+        if idx in removed or len(clause) == 0:
+            continue
+        lists = sorted((occurrences[lit] for lit in clause), key=len)
+        candidates = lists[0].intersection(*lists[1:])
+        for other in candidates:
+            if other != idx and other not in removed:
+                proof.append(['d'] + clauses[other])
+                removed.add(other)
+                for lit in clauses[other]:
+                    occurrences[lit].discard(other)
+    stats['subsumed'] = len(removed)
+    return [clause for idx, clause in enumerate(clauses) if idx not in removed]
@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from pysat.formula import CNF
+from pysat.solvers import Solver
+from checksums import stage
+
+def read_icnf(filename):
+    clauses, cubes = [], []
+    with open(filename, 'r') as f:
+        for line in f:
+            if line.startswith('a '):
+                cubes.append(list(map(int, line[2:].split()))[:-1])
+            elif line[:1] not in ['c', 'p', '\n', '']:
+                clauses.append(list(map(int, line.split()))[:-1])
+    return clauses, cubes
+
+def solve_shard(job):
+    idx, shard_file, base_file, solver_name = job
+    start = time.time()
+    clauses, cubes = read_icnf(shard_file)
+    if base_file is not None:
+        clauses = CNF(from_file=base_file).clauses
+    solver = Solver(name=solver_name, bootstrap_with=clauses)
+    sat_cubes = []
+    for cube_idx, cube in enumerate(cubes):
+        if solver.solve(assumptions=cube):
+            sat_cubes.append(cube_idx)
+    conflicts = solver.accum_stats().get('conflicts', 0)
+    solver.delete()
+    return idx, len(cubes), sat_cubes, time.time() - start, conflicts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Solves the cube shards listed in a manifest, one worker per shard, as if on separate nodes.")
+    parser.add_argument('-m', '--manifest', help='manifest written by from_placement.py --shards', required=True)
+    parser.add_argument('-j', '--jobs', type=int, help='number of parallel workers (defaults to the number of shards)', default=None)
+    parser.add_argument('-s', '--solver', help='pysat solver name', default='cadical153')
+    parser.add_argument('--only', type=int, help='solves only the shard with this index', default=None)
+    args = parser.parse_args()
+
+    with open(args.manifest, 'r') as f:
+        manifest = json.load(f)
+    directory = os.path.dirname(args.manifest)
+
+    base_file = None
+    if 'base' in manifest:
+        base_file, = stage(directory, (manifest['base']['file'], manifest['base']['sha256']))
+    jobs = []
+    for idx, shard in enumerate(manifest['shards']):
+        if args.only is not None and idx != args.only:
+            continue
+        shard_file, = stage(directory, (shard['file'], shard['sha256']))
+        jobs.append((idx, shard_file, base_file, args.solver))
+    print(f'{len(jobs)} shards staged, {sum(manifest["shards"][job[0]]["cubes"] for job in jobs)} cubes')
+    if not jobs:
+        sys.exit(0)
+
+    start = time.time()
+    sat = False
+    with Pool(args.jobs if args.jobs is not None else len(jobs)) as pool:
+        for idx, n_cubes, sat_cubes, seconds, conflicts in pool.imap_unordered(solve_shard, jobs):
+            shard = manifest['shards'][idx]
+            assert n_cubes == shard['cubes'], f'shard {idx} holds {n_cubes} cubes, manifest says {shard["cubes"]}'
+            status = 'UNSAT' if len(sat_cubes) == 0 else f'SAT ({len(sat_cubes)} cubes)'
+            print(f'shard {idx}: {n_cubes} cubes, {status}, {seconds:.2f}s, {conflicts} conflicts')
+            if sat_cubes:
+                sat = True
+                cube_indices = range(shard['cube_indices']['start'], shard['cube_indices']['stop'], shard['cube_indices']['step'])
+                print(f'  satisfiable cubes (global indices): {[cube_indices[c] for c in sat_cubes[:10]]}')
+    print(f'{"SAT" if sat else "UNSAT"} (wall-clock {time.time() - start:.2f}s)')
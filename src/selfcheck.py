@@ -0,0 +1,89 @@
+import collections
+import multiprocessing
+from pysat.solvers import Solver
+
+def check_lines(job):
+    # Forward DRAT check of lines = [(file, line number, lits)] starting from formula, with the
+    # unit propagation (watched literals) of a pysat solver. Clauses that get deleted later carry
+    # a selector literal, assumed while they are alive; RAT is checked on the first literal, which
+    # must not be the negation of a literal in elsewhere (the clauses of the other jobs).
+    # Returns (label, None) or (label, first failing line).
+    label, formula, lines, solver_name, elsewhere = job
+    doomed = set(tuple(sorted(set(lits[1:]))) for _, _, lits in lines if lits and lits[0] == 'd')
+    top = max([abs(lit) for clause in formula for lit in clause] + [abs(lit) for _, _, lits in lines for lit in lits if lit != 'd'] + [0])
+    solver = Solver(name=solver_name)
+    clauses = {} # id -> clause
+    ids = {} # sorted clause -> ids
+    occurrences = {} # literal -> ids
+    selectors = {} # id -> selector of a clause to be deleted
+    active = set()
+    n_added = 0
+
+    def add(clause):
+        nonlocal top, n_added
+        n_added += 1
+        idx = n_added
+        key = tuple(sorted(set(clause)))
+        clauses[idx] = clause
+        ids.setdefault(key, []).append(idx)
+        for lit in clause:
+            occurrences.setdefault(lit, set()).add(idx)
+        if key in doomed:
+            top += 1
+            selectors[idx] = top
+            active.add(top)
+            solver.add_clause(clause + [-top])
+        else:
+            solver.add_clause(clause)
+
+    def rup(lits):
+        return not solver.propagate(assumptions=sorted(active) + [-lit for lit in lits])[0]
+
+    for clause in formula:
+        add(list(clause))
+    for name, number, lits in lines:
+        if lits and lits[0] == 'd':
+            key = tuple(sorted(set(lits[1:])))
+            if not ids.get(key):
+                continue # deleting a missing clause is ignored, as drat-trim does
+            idx = ids[key].pop()
+            for lit in clauses.pop(idx):
+                occurrences[lit].discard(idx)
+            if idx in selectors:
+                active.discard(selectors.pop(idx))
+            continue
+        if not rup(lits):
+            if len(lits) == 0 or -lits[0] in elsewhere:
+                solver.delete()
+                return label, (name, number, lits)
+            pivot = lits[0]
+            for idx in occurrences.get(-pivot, ()):
+                resolvent = set(lits) | set(lit for lit in clauses[idx] if lit != -pivot)
+                if any(-lit in resolvent for lit in resolvent):
+                    continue
+                if not rup(list(resolvent)):
+                    solver.delete()
+                    return label, (name, number, lits)
+        add(list(lits))
+    solver.delete()
+    return label, None
+
+def literals_elsewhere(jobs):
+    # for each job, the literals occurring in the formula or lines of another job
+    occurring = [set(lit for clause in formula for lit in clause) | set(lit for _, _, lits in lines for lit in lits if lit != 'd')
+                 for _, formula, lines, _ in jobs]
+    counts = collections.Counter(lit for lits in occurring for lit in lits)
+    return [set(lit for lit, count in counts.items() if count > (lit in lits)) for lits in occurring]
+
+def check_all(jobs, n_workers=None):
+    # runs the jobs in parallel and returns the failures, in job order. Workers are forked, since
+    # the calling scripts have no main guard; without fork the jobs run one after the other.
+    # The jobs are checked as independent parts of one proof: a line that needs RAT fails when the
+    # negation of its pivot occurs in another job, where the whole proof has more candidate clauses.
+    jobs = [job + (elsewhere,) for job, elsewhere in zip(jobs, literals_elsewhere(jobs))]
+    if 'fork' in multiprocessing.get_all_start_methods() and len(jobs) > 1:
+        with multiprocessing.get_context('fork').Pool(n_workers) as pool:
+            results = pool.map(check_lines, jobs)
+    else:
+        results = [check_lines(job) for job in jobs]
+    return [(label, failure) for label, failure in results if failure is not None]
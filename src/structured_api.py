@@ -1,18 +1,56 @@
 import sys
+import json
 import itertools
+import math
+import numpy as np
+import amo
 from pysat.formula import CNF
 from pysat.card import *
 
+# encodings of the border bound: one clause per forbidden subset, or a pysat encoding producing clauses for at-most-k
+CARD_ENCODINGS = ['combinations', 'seqcounter', 'sortnetwrk', 'cardnetwrk', 'totalizer', 'mtotalizer', 'kmtotalizer']
+
+# radius -> lowest color, for foreign_clauses
+FOREIGN = {
+    1: 2,
+    2: 5,
+    3: 6,
+    4: 8,
+    6: 10,
+}
+
 class Structure:
-    def __init__(self, radius, colors, symmetry_breaking_levels=1):
+    def __init__(self, radius, colors, symmetry_breaking_levels=1, period=None, amo_encoding='pairwise', amo_stride=1, layered=False):
         self.radius = radius
         self.colors = colors
         self.positions = []
         self.symmetry_breaking_levels = symmetry_breaking_levels
-        for i in range(-self.radius, self.radius+1):
-            for j in range(-self.radius, self.radius+1):
-                if abs(i) + abs(j) <= self.radius:
+        # period = (n, m) encodes an n x m torus (periodic colorings) instead of the diamond D_radius
+        self.period = period
+        if period is None:
+            for i in range(-self.radius, self.radius+1):
+                for j in range(-self.radius, self.radius+1):
+                    if abs(i) + abs(j) <= self.radius:
+                        self.positions.append((i, j))
+            if layered: # numbered ring by ring from the center, as grow() extends them
+                self.positions.sort(key=lambda pos: dist(pos, (0, 0)))
+            self.dist = dist
+            self.all_distances_leq = all_distances_leq
+        else:
+            for i in range(period[0]):
+                for j in range(period[1]):
                     self.positions.append((i, j))
+            assert not layered, "the layered numbering is only implemented for the diamond"
+            self.dist = lambda p1, p2: torus_dist(p1, p2, period)
+            self.all_distances_leq = lambda p1, p2, k: all_distances_leq(p1, p2, k, self.dist)
+        # encoding of the conflicts left over by the new variables (see amo.py)
+        self.amo_encoding = amo_encoding
+        self.amo_stride = amo_stride
+        self.amo_stats = {}
+        self.distances = None
+        self.templates = {} # conflicts between region shapes, see region_conflict and region_neighbors
+        # positions (and their variables) in lexicographic order, so that translating sorted offsets keeps the order
+        self.lexicographic = period is None and not layered
 
         self.V = {}
         for pos in self.positions:
@@ -26,32 +64,72 @@ class Structure:
         return ans
 
     def foreign_clauses(self):
-        M = {
-            1: 2,
-            2: 5,
-            3: 6,
-            4: 8,
-            6: 10,
-        }
+        M = FOREIGN
         ans = []
         for r in M.keys():
             for pos in self.positions:
-                if dist(pos, (0, 0)) + r > self.radius: continue
+                if self.period is None and dist(pos, (0, 0)) + r > self.radius: continue
                 clause = []
                 for pos2 in self.positions:
-                    if dist(pos, pos2) <= r:
+                    if self.dist(pos, pos2) <= r:
                         for col in range(M[r], self.colors+1):
                             clause.append(self.V[(pos2, col)])
                 ans.append(clause)
         return ans
-        
+
+    def foreign_aux_clauses(self, stats=None):
+        # foreign_clauses through shared auxiliary variables: ('ge', pos, m) for "pos has a color >= m" and
+        # ('row', cells, m) for "a cell of this row segment has a color >= m", each clause of foreign_clauses
+        # becoming the clause over the rows of its ball. Only the definitions used by these clauses
+        # (-aux => its cases) are in the formula. The proof defines the auxiliary variables both ways (RAT),
+        # derives the new clauses from the long ones (RUP), then deletes the other direction, so it needs
+        # the clauses of foreign_clauses in its starting state. Returns (clauses, proof).
+        clauses = []
+        proof = []
+        others = [] # definitions in the other direction, deleted at the end of the proof
+        defined = []
+        def define(key, cases):
+            if key not in self.V:
+                self.V[key] = len(self.V) + 1
+                defined.append(key)
+                clauses.append([-self.V[key]] + cases)
+                proof.append(clauses[-1])
+                reverse = [[self.V[key], -lit] for lit in cases]
+                proof.extend(reverse)
+                others.extend(reverse)
+            return self.V[key]
+        n_long, literals_long = 0, 0
+        for r, lowest in FOREIGN.items():
+            for pos in self.positions:
+                if self.period is None and dist(pos, (0, 0)) + r > self.radius: continue
+                rows = {}
+                for pos2 in self.positions:
+                    if self.dist(pos, pos2) <= r:
+                        rows.setdefault(pos2[0], []).append(pos2)
+                n_long += 1
+                literals_long += sum(map(len, rows.values())) * max(0, self.colors - lowest + 1)
+                if lowest > self.colors: # as in foreign_clauses, there is nothing to choose from
+                    clauses.append([])
+                    continue
+                clause = []
+                for cells in rows.values():
+                    highs = [define(('ge', cell, lowest), [self.V[(cell, col)] for col in range(lowest, self.colors+1)]) for cell in cells]
+                    clause.append(define(('row', tuple(cells), lowest), highs))
+                clauses.append(clause)
+                proof.append(clause)
+        proof.extend(['d'] + clause for clause in others)
+        if stats is not None:
+            stats.update({'clauses': len(clauses), 'literals': sum(map(len, clauses)), 'vars': len(defined),
+                          'long_clauses': n_long, 'long_literals': literals_long})
+        return clauses, proof
+
     def alod_clauses(self, color_limit=1):
         ans = []
         for color in range(1, color_limit+1):
             for pos in self.positions:
                 clause = [self.V[(pos, color)]] 
                 for pos2 in self.positions:
-                    if dist(pos, pos2) <= color and pos2 != pos:
+                    if self.dist(pos, pos2) <= color and pos2 != pos:
                         clause.append(self.V[(pos2, color)])
                 ans.append(clause)
         return ans
@@ -64,12 +142,13 @@ class Structure:
                 clause = [-1*self.V[(pos, color)]]
                 for smaller_color in range(1, color):
                     for pos2 in self.positions:
-                        if pos2 != pos and dist(pos, pos2) <= smaller_color:
+                        if pos2 != pos and self.dist(pos, pos2) <= smaller_color:
                             clause.append(self.V[(pos2, smaller_color)]) 
                 ans.append(clause)
         return ans
 
     def symmetry_breaking(self):
+        assert self.period is None, "symmetry breaking is only implemented for the diamond"
         clauses = []
         for col in range(self.colors, self.colors-self.symmetry_breaking_levels, -1):
             clause = []
@@ -133,27 +212,277 @@ class Structure:
         tokens.append(0)
         return ' '.join(list(map(str, tokens)))
 
-    def center_force(self, val_to_force=None):
+    def center_force(self, val_to_force=None, colors=None):
+        if colors is None:
+            colors = self.colors
         if val_to_force is None or val_to_force == 0:
-            val_to_force = min(self.radius, self.colors)
+            if self.period is not None:
+                # breaks the translation symmetry: a coloring using the highest color can be shifted to put it at (0, 0).
+                # Colors >= the smallest side conflict with their own translates, so they are not counted
+                val_to_force = min(colors, min(self.period)-1)
+            else:
+                val_to_force = min(self.radius, colors)
         return [self.V[((0,0), val_to_force)]]
 
-    def conflict_clauses(self, new_vars_per_color, singlecolor=None):
+    def activation_clauses(self, min_colors):
+        # each color above min_colors can only be used when its activation variable ('a', color) is true,
+        # so that a single formula for self.colors can be solved for any number of colors >= min_colors
+        clauses = []
+        for color in range(min_colors+1, self.colors+1):
+            if ('a', color) not in self.V:
+                self.V[('a', color)] = len(self.V) + 1
+            for pos in self.positions:
+                clauses.append([-1*self.V[(pos, color)], self.V[('a', color)]])
+        return clauses
+
+    def sweep_assumptions(self, colors, center_force=0):
+        # assumptions selecting colors 1..colors (activation_clauses must be part of the formula);
+        # the center is forced through an assumption as well since its default value depends on colors
+        assumptions = [-1*self.V[('a', color)] for color in range(colors+1, self.colors+1)]
+        if center_force != -1:
+            assumptions.extend(self.center_force(center_force, colors))
+        return assumptions
+
+    def grow(self):
+        # D_radius -> D_{radius+1}: the positions of the new ring get variables after all the existing ones,
+        # so that a formula over D_radius remains valid (see layer_clauses for the clauses to add)
+        assert self.period is None, "only the diamond can grow"
+        self.radius += 1
+        ring = [(i, j) for i in range(-self.radius, self.radius+1) for j in range(-self.radius, self.radius+1) if abs(i) + abs(j) == self.radius]
+        self.positions.extend(ring)
+        for pos in ring:
+            for color in range(1, self.colors+1):
+                self.V[(pos, color)] = len(self.V) + 1
+        self.distances = None
+        return ring
+
+    def layer_literal(self, radius=None):
+        # the clauses that only hold for a given radius contain the negation of its layer literal,
+        # which is assumed while solving for that radius
+        key = ('r', self.radius if radius is None else radius)
+        if key not in self.V:
+            self.V[key] = len(self.V) + 1
+        return self.V[key]
+
+    def layer_clauses(self, new_positions, alod=0, minimization=False, foreign=False, symmetry=False, border_ones=0, cardenc='seqcounter', chessboard=False, center_force=0):
+        # the clauses of the direct encoding of D_radius that are not there yet when new_positions are the
+        # ones added by grow() (all positions for the first call):
+        #  - long, conflict, foreign and chessboard clauses never change with the radius, only those
+        #    over new variables are added;
+        #  - center, ALOD, minimization, symmetry and border clauses do, they are added again for each
+        #    radius with the negated layer literal, and the previous layer is switched off by a unit.
+        new = set(self.V[(pos, color)] for pos in new_positions for color in range(1, self.colors+1))
+        grown = [clause for clause in self.long_clauses() if abs(clause[0]) in new]
+        for color in range(1, self.colors+1):
+            for pos in new_positions:
+                for pos2 in self.positions:
+                    if (self.V[(pos2, color)] not in new or self.V[(pos, color)] < self.V[(pos2, color)]) and pos2 != pos and dist(pos, pos2) <= color:
+                        grown.append([-1*self.V[(pos, color)], -1*self.V[(pos2, color)]])
+        if foreign:
+            grown.extend(clause for clause in self.foreign_clauses() if any(lit in new for lit in clause))
+        if chessboard:
+            grown.extend(clause for clause in self.chessboard() if clause[0] in new)
+        changed = []
+        if center_force != -1:
+            changed.append(self.center_force(center_force))
+        if alod:
+            changed.extend(self.alod_clauses(alod))
+        if minimization:
+            changed.extend(self.minimization_clauses())
+        if symmetry:
+            changed.extend(self.symmetry_breaking())
+        if border_ones:
+            changed.extend(self.bounded_border_ones(border_ones, cardenc))
+        if ('r', self.radius-1) in self.V:
+            grown.append([-1*self.V[('r', self.radius-1)]])
+        layer = self.layer_literal()
+        return grown + [clause + [-layer] for clause in changed]
+
+    def conflict_clauses(self, new_vars_per_color, singlecolor=None, hints=None):
         ans = []
         prf = []
         color_range = [singlecolor] if singlecolor is not None else list(range(1, self.colors+1))
+        self.proof_segments = {} # color -> (start, end) of its lines in the proof
         for color in color_range:
-            clses, proof = self.structured(color, new_vars_per_color[color])
+            clses, proof = self.structured(color, new_vars_per_color[color], hints)
             ans.extend(clses)
+            ans.extend(self.self_conflicts(color))
+            self.proof_segments[color] = (len(prf), len(prf) + len(proof))
             prf.extend(proof)
         return ans, prf
 
-    def bounded_border_ones(self, bound):
+    def direct_conflicts(self, color):
+        # the clauses of the direct encoding for a single color
+        clauses = []
+        for pos in self.positions:
+            for pos2 in self.positions:
+                if self.V[(pos, color)] < self.V[(pos2, color)] and self.dist(pos, pos2) <= color:
+                    clauses.append([-1*self.V[(pos, color)], -1*self.V[(pos2, color)]])
+        return clauses + self.self_conflicts(color)
+
+
+    def self_conflicts(self, color):
+        # on a torus with a side <= color, a cell is within distance color of its own translate
+        if self.period is None or min(self.period) > color:
+            return []
+        return [[-1*self.V[(pos, color)]] for pos in self.positions]
+
+    def position_distances(self, P, Q):
+        # distances between the positions of the int16 arrays P (m x 2) and Q (n x 2), as an m x n int16 array
+        # (int16 holds the distances of any radius below 8192, in a quarter of the memory of int64)
+        distances = np.zeros((len(P), len(Q)), dtype=np.int16)
+        for axis in range(2):
+            delta = P[:, None, axis] - Q[None, :, axis]
+            np.abs(delta, out=delta)
+            if self.period is not None:
+                delta %= self.period[axis]
+                np.minimum(delta, self.period[axis] - delta, out=delta)
+            distances += delta
+        return distances
+
+    def distance_matrix(self):
+        # distances between all pairs of positions, in the order of self.positions
+        if self.distances is None:
+            P = np.array(self.positions, dtype=np.int16)
+            self.distances = self.position_distances(P, P)
+        return self.distances
+
+    def count_structured(self, color, list_new_variables):
+        # sizes of structured(color, list_new_variables) without building its clauses: the new variables
+        # are numbered as in structured, and the conflicts are counted on boolean matrices over positions
+        # (regions x positions for the membership R, positions x positions for the solved conflicts)
+        if self.amo_encoding != 'pairwise':
+            clauses, proof = self.structured(color, list_new_variables)
+            return {'vars': len(set(var for clause in clauses for var in map(abs, clause) if var > len(self.positions)*self.colors)),
+                    'clauses': len(clauses), 'literals': sum(map(len, clauses)),
+                    'proof_lines': len(proof), 'proof_literals': sum(len(line) - (line[0] == 'd') for line in proof if line)}
+        counts = {'clauses': 0, 'literals': 0, 'proof_lines': 0, 'proof_literals': 0}
+        index = {pos: k for k, pos in enumerate(self.positions)}
+        regions = {}
+        for list_variable in list_new_variables:
+            list_variable = [self.normalize(pos) for pos in list_variable]
+            if ('n', color, tuple(list_variable)) not in self.V:
+                self.V[('n', color, tuple(list_variable))] = len(self.V) + 1
+            regions[self.V[('n', color, tuple(list_variable))]] = [index[pos] for pos in list_variable]
+            size = len(list_variable)
+            counts['clauses'] += size # permission clauses
+            counts['literals'] += 2*size
+            counts['proof_lines'] += size + 2 # with the long clause, added and deleted
+            counts['proof_literals'] += 2*size + 2*(size+1)
+        counts['vars'] = len(regions)
+
+        n, k = len(self.positions), len(regions)
+        distances = self.distance_matrix()
+        nvs = np.array(list(regions.keys()))
+        R = np.zeros((k, n), dtype=bool)
+        for a, members in enumerate(regions.values()):
+            R[a, members] = True
+        Rf = R.astype(np.float32)
+        # far[a, p]: largest distance between p and the region a
+        far = np.array([distances[members].max(axis=0) for members in regions.values()]).reshape(k, n)
+        max_distance = np.array([far[:, members].max(axis=1) for members in regions.values()]).reshape(k, k).T
+        two_var = (nvs[:, None] < nvs[None, :]) & (max_distance <= color) & (Rf @ Rf.T == 0)
+        in_two_var = (two_var | two_var.T).astype(np.float32)
+        residual = ~R & (far <= color) & ~((in_two_var @ Rf) > 0)
+        deleted = (residual.T.astype(np.float32) @ Rf) > 0
+        deleted |= deleted.T
+        solved = ((Rf.T @ in_two_var @ Rf) > 0) | deleted
+        pairwise = np.triu((distances <= color) & ~solved, 1)
+
+        n_binary = int(two_var.sum() + residual.sum() + pairwise.sum())
+        counts['clauses'] += n_binary
+        counts['literals'] += 2*n_binary
+        n_lines = int(residual.sum() + np.triu(deleted, 1).sum() + two_var.sum())
+        counts['proof_lines'] += n_lines
+        counts['proof_literals'] += 2*n_lines
+        return counts
+
+    def count_conflict_clauses(self, new_vars_per_color, singlecolor=None):
+        # sizes of conflict_clauses(new_vars_per_color, singlecolor), see count_structured
+        total = {'vars': 0, 'clauses': 0, 'literals': 0, 'proof_lines': 0, 'proof_literals': 0}
+        color_range = [singlecolor] if singlecolor is not None else list(range(1, self.colors+1))
+        for color in color_range:
+            for key, value in self.count_structured(color, new_vars_per_color[color]).items():
+                total[key] += value
+            if self.period is not None and min(self.period) <= color:
+                total['clauses'] += len(self.positions)
+                total['literals'] += len(self.positions)
+        return total
+
+    def count_alod(self, color_limit=1):
+        # (clauses, literals) of alod_clauses(color_limit)
+        distances = self.distance_matrix()
+        return color_limit*len(self.positions), int(sum((distances <= color).sum() for color in range(1, color_limit+1)))
+
+    def count_minimization(self):
+        # (clauses, literals) of minimization_clauses()
+        distances = self.distance_matrix()
+        near = [(distances <= color).sum(axis=1) - 1 for color in range(self.colors+1)]
+        n_positions = len(self.positions) - ((0, 0) in self.positions)
+        literals = 0
+        for k, pos in enumerate(self.positions):
+            if pos == (0, 0): continue
+            for color in range(2, self.colors+1):
+                literals += 1 + sum(int(near[smaller_color][k]) for smaller_color in range(1, color))
+        return n_positions*(self.colors-1), literals
+
+    def count_foreign(self):
+        # (clauses, literals) of foreign_clauses()
+        distances = self.distance_matrix()
+        clauses, literals = 0, 0
+        for r, lowest in FOREIGN.items():
+            for k, pos in enumerate(self.positions):
+                if self.period is None and dist(pos, (0, 0)) + r > self.radius: continue
+                clauses += 1
+                literals += int((distances[k] <= r).sum()) * max(0, self.colors - lowest + 1)
+        return clauses, literals
+
+    def count_symmetry_breaking(self):
+        # (clauses, literals) of symmetry_breaking()
+        clauses, literals = 0, 0
+        for col in range(self.colors, self.colors-self.symmetry_breaking_levels, -1):
+            base = sum(1 for h_col in range(col+1, self.colors+1) for pos in self.positions if dist(pos, (0,0)) <= h_col//2 and main_octant(*pos))
+            n = sum(1 for pos in self.positions if dist(pos, (0, 0)) <= col//2 and not main_octant(*pos))
+            clauses += n
+            literals += n*(base+1)
+        return clauses, literals
+
+    def count_bounded_border_ones(self, bound, encoding='combinations'):
+        # (clauses, literals) of bounded_border_ones(bound, encoding); the pysat encodings are built
+        # (they are small), which also allocates their auxiliary variables
+        if encoding != 'combinations':
+            clauses = self.bounded_border_ones(bound, encoding)
+            return len(clauses), sum(map(len, clauses))
+        n_border = sum(1 for p in self.positions if dist(p, (0,0)) == self.radius)
+        return math.comb(n_border, bound+1), math.comb(n_border, bound+1)*(bound+1)
+
+    def count_chessboard(self):
+        # (clauses, literals) of chessboard()
+        n = sum(1 for i, j in self.positions if (i+j)%2)
+        return n, n
+
+    def normalize(self, pos):
+        if self.period is None:
+            return tuple(pos)
+        return (pos[0] % self.period[0], pos[1] % self.period[1])
+
+    def bounded_border_ones(self, bound, encoding='combinations'):
+        # at most bound 1s in the border; 'combinations' forbids every set of bound+1 border cells,
+        # any other value names a pysat cardinality encoding (seqcounter, totalizer, sortnetwrk, ...)
+        assert self.period is None, "a torus has no border"
+        if encoding not in CARD_ENCODINGS:
+            raise ValueError(f'unknown border bound encoding {encoding!r}, expected one of {", ".join(CARD_ENCODINGS)}')
         clauses = []
         border = list(filter(lambda p: dist(p, (0,0))==self.radius, self.positions))
-        for cmb in itertools.combinations(border, bound+1):
-            clauses.append([-1*self.V[(p, 1)] for p in list(cmb)])
-        return clauses
+        if encoding == 'combinations':
+            for cmb in itertools.combinations(border, bound+1):
+                clauses.append([-1*self.V[(p, 1)] for p in list(cmb)])
+            return clauses
+        top = len(self.V)
+        card = CardEnc.atmost(lits=[self.V[(p, 1)] for p in border], bound=bound, top_id=top, encoding=getattr(EncType, encoding))
+        for var in range(top+1, card.nv+1): # auxiliary variables of the encoding
+            self.V[('border', var)] = var
+        return card.clauses
 
     def chessboard(self):
         clauses = []
@@ -164,7 +493,53 @@ class Structure:
         return clauses
 
 
-    def structured(self, color, list_new_variables):
+    def offset(self, p, q):
+        # q - p, modulo the period on a torus
+        if self.period is None:
+            return (q[0]-p[0], q[1]-p[1])
+        return ((q[0]-p[0]) % self.period[0], (q[1]-p[1]) % self.period[1])
+
+    def region_conflict(self, region1, region2, color):
+        # whether two disjoint regions, given as (anchor, shape), are within distance color of each other
+        # everywhere; computed once for each pair of shapes, offset and color
+        (anchor1, shape1), (anchor2, shape2) = region1, region2
+        key = (shape1, shape2, self.offset(anchor1, anchor2), color)
+        if key not in self.templates:
+            moved = [(p[0]+key[2][0], p[1]+key[2][1]) for p in shape2]
+            self.templates[key] = self.all_distances_leq(shape1, moved, color) and \
+                len(intersection([self.normalize(p) for p in shape1], [self.normalize(p) for p in moved])) == 0
+        return self.templates[key]
+
+    def region_neighbors(self, region, color, index):
+        # the positions outside a region (anchor, shape) within distance color of all its cells, in the order
+        # of index; their offsets from the anchor (normalized, in lexicographic order) are computed once for
+        # each shape and color, then translated and clipped to the positions
+        anchor, shape = region
+        key = (shape, color)
+        if key not in self.templates:
+            inside = set(self.normalize(p) for p in shape)
+            offsets = []
+            for i in range(-color, color+1):
+                for j in range(abs(i)-color, color-abs(i)+1):
+                    o = self.normalize((i, j))
+                    if o not in inside and o not in offsets and self.all_distances_leq(shape, [(i, j)], color):
+                        offsets.append(o)
+            self.templates[key] = offsets
+        if self.period is None:
+            cells = [(anchor[0]+o[0], anchor[1]+o[1]) for o in self.templates[key]]
+        else:
+            cells = [self.normalize((anchor[0]+o[0], anchor[1]+o[1])) for o in self.templates[key]]
+        cells = [pos for pos in cells if pos in index]
+        if not self.lexicographic:
+            cells.sort(key=index.get)
+        return cells
+
+    def structured(self, color, list_new_variables, hints=None):
+        # with a hints list, the justification of each proof line is appended to it (see lrat.py)
+        if hints is None:
+            hints = []
+        else:
+            assert self.amo_encoding == 'pairwise', "no hints for the at-most-one encodings"
         clauses = []
         proof = []
         M = {} # Membership mapping; for each position, map it to new variables it belongs to
@@ -174,7 +549,9 @@ class Structure:
         # assume list new variables is a list L of lists.
         # Each list l in L is a list of positions, corresponding to a new variable.
         long_clauses = []
+        long_of = {}
         for list_variable in list_new_variables:
+            list_variable = [self.normalize(pos) for pos in list_variable]
             if ('n', color, tuple(list_variable)) not in self.V:
                 self.V[('n', color, tuple(list_variable))] = len(self.V) + 1
             this_nv = self.V[('n', color, tuple(list_variable))]
@@ -186,30 +563,31 @@ class Structure:
                     M[position].append(this_nv)
                 clauses.append([this_nv, -1*self.V[(position, color)]]) # permission clauses
                 proof.append(clauses[-1])
+                hints.append(None)
             proof.append([-this_nv] + [self.V[(position, color)] for position in list_variable])
+            hints.append(None)
             long_clauses.append(proof[-1])
+            long_of[this_nv] = proof[-1]
         
 
+        # regions as (anchor, shape): the conflicts between them only depend on the shapes and their offset
+        regions = {nv: (D[nv][0], tuple(self.offset(D[nv][0], p) for p in D[nv])) for nv in D}
+
         # implications between two (new) variables.
         two_var_clauses = []
+        two_var_pairs = []
         conflicts = {}
         for nv1 in D.keys():
             for nv2 in D.keys():
-                pos1, pos2 = D[nv1], D[nv2]
-                if nv1  < nv2  and all_distances_leq(pos1, pos2, color):
-                    inter = intersection(D[nv1], D[nv2])
-                    if len(inter) != 0:
-                        continue
-
-                    intersection_clause = [self.V[(p, color)] for p in inter]
-                    clauses.append([-nv1, -nv2] + intersection_clause)
+                if nv1  < nv2  and self.region_conflict(regions[nv1], regions[nv2], color):
+                    clauses.append([-nv1, -nv2]) # the regions are disjoint
                     for p in D[nv1]:
                         for q in D[nv2]:
-                            if p not in inter and q not in inter:
-                                conflicts_solved[(p, q)] = True
-                                conflicts_solved[(q, p)] = True
-                                
+                            conflicts_solved[(p, q)] = True
+                            conflicts_solved[(q, p)] = True
+
                     two_var_clauses.append(clauses[-1])
+                    two_var_pairs.append((nv1, nv2))
                     if nv1 not in conflicts:
                         conflicts[nv1] = []
                     if nv2 not in conflicts:
@@ -218,43 +596,65 @@ class Structure:
                     conflicts[nv2].append(nv1)
 
         # positions that are in conflict between a variable without being in a two-variable conflict
-        deletions = {}
+        deletions = {} # deleted binary conflict -> (residual, permission) clauses implying it
+        def conflict_hints(p, q):
+            a, b = self.V[(p, color)], self.V[(q, color)]
+            return deletions.get((min(a,b), max(a,b)), [[-a, -b]])
+        index = {pos: k for k, pos in enumerate(self.positions)}
         for nv in D.keys():
             pos_nv = D[nv]
-            for pos in self.positions:
-                add_clause = False
-                if pos not in pos_nv and all_distances_leq(pos_nv, [pos], color):
-                    add_clause = True
-                    if pos in M and nv in conflicts: # pos is part of another variable
-                        # we need to check whether it's part of a two-variable conflict
-                        for nv2 in M[pos]:
-                            if nv2 in conflicts[nv]:
-                                add_clause = False
-                                break
-                    if add_clause:
-                        clauses.append([-nv, -1*self.V[(pos, color)]])
-                        proof.append(clauses[-1])
-                        for des in D[nv]:
-                            a, b = self.V[(pos, color)], self.V[(des, color)]
-                            if (min(a,b), max(a,b)) not in deletions:
-                                proof.append(['d', -1*a, -1*b])
-                                deletions[(min(a,b), max(a,b))] = True
+            for pos in self.region_neighbors(regions[nv], color, index):
+                add_clause = True
+                if pos in M and nv in conflicts: # pos is part of another variable
+                    # we need to check whether it's part of a two-variable conflict
+                    for nv2 in M[pos]:
+                        if nv2 in conflicts[nv]:
+                            add_clause = False
+                            break
                 if add_clause:
+                    clauses.append([-nv, -1*self.V[(pos, color)]])
+                    proof.append(clauses[-1])
+                    hints.append(('rup', [c for des in D[nv] for c in conflict_hints(pos, des)] + [long_of[nv]]))
+                    for des in D[nv]:
+                        a, b = self.V[(pos, color)], self.V[(des, color)]
+                        if (min(a,b), max(a,b)) not in deletions:
+                            proof.append(['d', -1*a, -1*b])
+                            hints.append(None)
+                            deletions[(min(a,b), max(a,b))] = [clauses[-1], [nv, -b]]
                     for p in pos_nv:
                         conflicts_solved[(pos, p)] = True
                         conflicts_solved[(p, pos)] = True
                         
         proof.extend(two_var_clauses)
+        for nv1, nv2 in two_var_pairs:
+            # RAT on -nv1: each x_p of nv1 is in conflict with all of nv2, whose long clause fails
+            hints.append(('rat', [([nv1, -self.V[(p, color)]], [c for q in D[nv2] for c in conflict_hints(p, q)] + [long_of[nv2]]) for p in D[nv1]]))
 
         # conflicts that are not captured by new variables
-        for pos in self.positions:
-            for pos2 in self.positions:
-                if self.V[(pos, color)] <  self.V[(pos2, color)] and dist(pos, pos2) <= color:
-                    if (pos, pos2) not in conflicts_solved:
-                        clauses.append([-1*self.V[(pos, color)], -1*self.V[(pos2, color)]])
+        # (the variables of a color are numbered in the order of the positions)
+        # (row by row, without the n x n distance matrix)
+        residual = []
+        P = np.array(self.positions, dtype=np.int16)
+        for k, pos in enumerate(self.positions):
+            for k2 in np.flatnonzero(self.position_distances(P[k:k+1], P[k+1:])[0] <= color):
+                pos2 = self.positions[k+1+k2]
+                if (pos, pos2) not in conflicts_solved:
+                    residual.append((pos, pos2))
+
+        amo_clauses, amo_proof = [], []
+        if self.amo_encoding != 'pairwise' and len(residual) > 0:
+            # the residual conflicts within a clique become a single at-most-one constraint
+            amo_clauses, amo_proof, residual = amo.amo_clauses(self.positions, residual, color, lambda pos: self.V[(pos, color)],
+                                                               self.amo_encoding, self.V, self.normalize if self.period is not None else None,
+                                                               self.amo_stride, self.amo_stats)
+        for pos, pos2 in residual:
+            clauses.append([-1*self.V[(pos, color)], -1*self.V[(pos2, color)]])
+        clauses.extend(amo_clauses)
 
         for long in long_clauses:
             proof.append(['d'] + long)
+            hints.append(None)
+        proof.extend(amo_proof)
         return clauses, proof
 
     def cubes(self, n_colors_to_split, n_positive_lits,  new_vars_per_color, n_new_vars_to_split, reverse_cubes=False, center_force=None):
@@ -269,7 +669,7 @@ class Structure:
         print(rel_colors)
         for col in rel_colors:
             new_vars_to_use  = sorted(new_vars_per_color[col], key=dist_to_center)[:n_new_vars_to_split]
-            vpc[col] = [self.V[('n', col, tuple(t))] for t in new_vars_to_use]
+            vpc[col] = [self.V[('n', col, tuple(map(self.normalize, t)))] for t in new_vars_to_use]
         for cb_size in range(n_positive_lits, -1, -1):
             for cmb in itertools.combinations(list(range(n_colors_to_split)), cb_size):
                     products = itertools.product(*([vpc[rel_colors[i]] for i in cmb]))
@@ -285,6 +685,25 @@ class Structure:
         return cbs # + [[]]
 
 
+def parse_centers(centers, colors, mode):
+    # the center colors given to --centers ('all' or a comma-separated list), None without it.
+    # The formula (and proof) is then serialized once, the variants only differ by the unit clause
+    # forcing the center, so that each file is byte-identical to the output of a run with -c <c>
+    if centers is None:
+        return None
+    centers = list(range(1, colors+1)) if centers == 'all' else [int(c) for c in centers.split(',')]
+    assert all(1 <= c <= colors for c in centers) and mode in ['icnf', 'files']
+    return centers
+
+def read_placement(filename):
+    # placement file: color -> list of regions, each a list of positions
+    with open(filename, 'r') as f:
+        placement_map_json = json.load(f)
+    placement_map = {}
+    for k,v in placement_map_json.items():
+        placement_map[int(k)] = list(map(lambda x: list(map(tuple, x)), v))
+    return placement_map
+
 def dist_to_center(shape):
     s = 0
     for pos in shape:
@@ -294,7 +713,11 @@ def dist_to_center(shape):
 def dist(p1, p2):
     return abs(p1[0]-p2[0]) + abs(p1[1] - p2[1])
 
-def all_distances_leq(p1, p2, k):
+def torus_dist(p1, p2, period):
+    di, dj = abs(p1[0]-p2[0]) % period[0], abs(p1[1]-p2[1]) % period[1]
+    return min(di, period[0]-di) + min(dj, period[1]-dj)
+
+def all_distances_leq(p1, p2, k, dist=dist):
     for pos1 in p1:
         for pos2 in p2:
             if dist(pos1, pos2) > k:
@@ -0,0 +1,65 @@
+import argparse
+import sys
+import structured_api
+from incremental import ColorSweep, RadiusSweep
+
+parser = argparse.ArgumentParser(description="Solves a radius for decreasing numbers of colors within a single solver.")
+parser.add_argument('-r', '--radius', help='radius', type=int, required=True)
+parser.add_argument('-k', '--colors', help='maximum number of colors', type=int, required=True)
+parser.add_argument('--mincolors', help='minimum number of colors to try', type=int, default=1)
+parser.add_argument('-i', '--input', help='placement file (plus encoding); the direct encoding is used if omitted', default=None)
+parser.add_argument('-c', '--centerforce', type=int, help="value to which the center is forced (-1 for no forcing, 0 for min(r, c))", default=0)
+parser.add_argument('-S', '--symmetry', type=int,  help='enables symmetry breaking for the specified number of layers', default=0)
+parser.add_argument('-A', '--alod', type=int, help='enables ALOD clauses', default=0)
+parser.add_argument('-g', '--geometry', help='geometry (diamond, or torus of side radius x height)', type=str, default="diamond")
+parser.add_argument('--height', help='height of the torus (defaults to the radius)', type=int, default=None)
+parser.add_argument('-s', '--solver', help='pysat solver name', default='cadical153')
+parser.add_argument('--all', help='keeps going after the first unsatisfiable number of colors', action='store_true')
+parser.add_argument('--maxradius', help='grows the radius from -r up to this value with -k colors instead (direct encoding), stopping at the first unsatisfiable radius', type=int, default=None)
+parser.add_argument('-v', '--verbose', action='count', default=0)
+args = parser.parse_args()
+
+radius = args.radius
+n_colors = args.colors
+min_colors = args.mincolors
+center_force = args.centerforce
+assert center_force >= -1 and center_force <= n_colors
+period = (radius, args.height if args.height is not None else radius) if args.geometry == "torus" else None
+
+if args.maxradius is not None:
+    assert args.input is None and period is None, "--maxradius grows the diamond with the direct encoding"
+    structurer = structured_api.Structure(radius, n_colors, args.symmetry, layered=True)
+    sweep = RadiusSweep(structurer, args.solver, alod=args.alod, symmetry=bool(args.symmetry), center_force=center_force)
+    if args.verbose > 0:
+        print(f'# vars = {len(structurer.V)}, # clauses = {len(sweep.clauses)}')
+    for r, result, seconds, conflicts in sweep.sweep(args.maxradius, stop_at_unsat=not args.all):
+        print(f'r = {r}: {"SAT" if result else "UNSAT"} ({seconds:.2f}s, {conflicts} conflicts)')
+        if not result and not args.all:
+            print(f'smallest radius with no {n_colors}-coloring: {r}')
+    if args.verbose > 0:
+        print(f'# vars = {len(structurer.V)}, # clauses = {len(sweep.clauses)}')
+    sweep.delete()
+    sys.exit(0)
+
+structurer = structured_api.Structure(radius, n_colors, args.symmetry, period)
+placement_map = {color: [] for color in range(1, n_colors+1)}
+if args.input is not None:
+    placement_map.update(structured_api.read_placement(args.input))
+
+clauses = structurer.long_clauses()
+conflict_clauses, conflict_proof = structurer.conflict_clauses(placement_map)
+clauses.extend(conflict_clauses)
+if args.symmetry:
+    clauses.extend(structurer.symmetry_breaking())
+
+sweep = ColorSweep(structurer, clauses, min_colors, center_force, args.solver, args.alod)
+if args.verbose > 0:
+    print(f'# vars = {len(structurer.V)}, # clauses = {len(sweep.clauses)}')
+last_sat = None
+for colors, result, seconds, conflicts in sweep.sweep(stop_at_unsat=not args.all):
+    print(f'k = {colors}: {"SAT" if result else "UNSAT"} ({seconds:.2f}s, {conflicts} conflicts)')
+    if result:
+        last_sat = colors
+if last_sat is not None:
+    print(f'smallest number of colors found for radius {radius}: {last_sat}')
+sweep.delete()
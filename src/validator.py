@@ -0,0 +1,95 @@
+import numpy as np
+
+def read_model(filename):
+    # reads solver output (or a bare list of literals), returns the status and the literals of the 'v' lines
+    status = None
+    lits = []
+    with open(filename, 'r') as f:
+        for line in f:
+            if line.startswith('s '):
+                status = line[2:].strip()
+            elif line.startswith('v '):
+                lits.extend(map(int, line[2:].split()))
+            elif line[:1] == '-' or line[:1].isdigit():
+                lits.extend(map(int, line.split()))
+    return status, [lit for lit in lits if lit != 0]
+
+def decode_model(model, positions, colors):
+    # maps the model through the numbering V[(pos, c)] = idx(pos)*colors + c shared by direct.py and Structure.
+    # Returns (grid, origin, domain): grid[x-x0][y-y0] is the color of (x, y), 0 if none,
+    # and domain marks the cells of the board.
+    # The encodings have no at-most-one constraints, so a cell may get several true colors;
+    # any of them gives a packing coloring, the smallest one is kept.
+    coords = np.array(positions, dtype=np.int64).reshape(-1, 2)
+    origin = coords.min(axis=0)
+    shape = tuple(coords.max(axis=0) - origin + 1)
+    grid = np.zeros(shape, dtype=np.int64)
+    domain = np.zeros(shape, dtype=bool)
+    domain[coords[:, 0] - origin[0], coords[:, 1] - origin[1]] = True
+
+    model = np.asarray(model, dtype=np.int64)
+    true_vars = model[(model > 0) & (model <= len(positions)*colors)]
+    idx, color = (true_vars - 1) // colors, (true_vars - 1) % colors + 1
+    order = np.argsort(-color, kind='stable') # smallest color written last
+    idx, color = idx[order], color[order]
+    grid[coords[idx, 0] - origin[0], coords[idx, 1] - origin[1]] = color
+    return grid, (int(origin[0]), int(origin[1])), domain
+
+def half_offsets(color):
+    # one of each pair of opposite vectors with 0 < |di| + |dj| <= color
+    ans = []
+    for di in range(0, color+1):
+        for dj in range(-(color-di), color-di+1):
+            if di > 0 or dj > 0:
+                ans.append((di, dj))
+    return ans
+
+def shifted_pairs(mask, di, dj, periodic):
+    # hit[x, y] is True when both (x, y) and (x+di, y+dj) are set
+    if periodic:
+        return mask & np.roll(mask, (-di, -dj), axis=(0, 1))
+    n, m = mask.shape
+    hit = np.zeros_like(mask)
+    if di >= n or abs(dj) >= m:
+        return hit
+    xa, xb = slice(0, n-di), slice(di, n)
+    ya, yb = (slice(0, m-dj), slice(dj, m)) if dj >= 0 else (slice(-dj, m), slice(0, m+dj))
+    hit[xa, ya] = mask[xa, ya] & mask[xb, yb]
+    return hit
+
+def conflicts(grid, periodic=False, limit=None, origin=(0, 0)):
+    # pairs of cells with the same color c at distance <= c, as (p, q, c) in board coordinates.
+    # With periodic=True the grid is one period of a pattern of the whole plane (a torus),
+    # so a cell also conflicts with the translates of itself.
+    grid = np.asarray(grid)
+    n, m = grid.shape
+    found = []
+    seen = set() # on a small torus several vectors can link the same two cells
+    for color in np.unique(grid[grid > 0]).tolist():
+        mask = grid == color
+        for di, dj in half_offsets(color):
+            hit = shifted_pairs(mask, di, dj, periodic)
+            if not hit.any():
+                continue
+            for x, y in np.argwhere(hit).tolist():
+                qx, qy = x + di, y + dj
+                if periodic:
+                    qx, qy = qx % n, qy % m
+                p = (x + origin[0], y + origin[1])
+                q = (qx + origin[0], qy + origin[1])
+                if (min(p, q), max(p, q), color) in seen:
+                    continue
+                seen.add((min(p, q), max(p, q), color))
+                found.append((p, q, color))
+                if limit is not None and len(found) >= limit:
+                    return found
+    return found
+
+def uncolored(grid, domain=None, origin=(0, 0)):
+    grid = np.asarray(grid)
+    if domain is None:
+        domain = np.ones(grid.shape, dtype=bool)
+    return [(x + origin[0], y + origin[1]) for x, y in np.argwhere(domain & (grid <= 0)).tolist()]
+
+def is_packing_coloring(grid, domain=None, periodic=False):
+    return len(uncolored(grid, domain)) == 0 and len(conflicts(grid, periodic, limit=1)) == 0